@@ -0,0 +1,40 @@
+import argparse
+import gc
+import tracemalloc
+from copy import deepcopy
+
+from tests import entities
+from tests.fixtures.hal_fixture import HalFixture
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory held by raw HAL documents and entity views.')
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+    fixture = HalFixture()
+
+    cases = [
+        ('raw documents, deep copied', lambda: [deepcopy(resource)
+                                                for resource in fixture.entities('files', args.count)]),
+        ('raw documents', lambda: list(fixture.entities('files', args.count))),
+        ('File views', lambda: list(entities.File.stream(fixture.entities('files', args.count)))),
+        ('uuids from views', lambda: [file.uuid for file in entities.File.stream(fixture.entities('files', args.count))])
+    ]
+    print(f'{"held for " + str(args.count) + " entities":<32} {"held (MB)":>10} {"peak (MB)":>10}')
+    for name, build in cases:
+        current, peak = measure(build)
+        print(f'{name:<32} {current / 2 ** 20:>10.1f} {peak / 2 ** 20:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
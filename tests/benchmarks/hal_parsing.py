@@ -0,0 +1,47 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+from tests import hal_stream, http_client
+from tests.stand_in import IngestStandIn
+
+
+def measure(read_uuids):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    uuids = read_uuids()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(uuids), seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare parsing a whole HAL listing with streaming its entities.')
+    parser.add_argument('--count', type=int, default=200000, help='number of files in the listing')
+    args = parser.parse_args()
+
+    with IngestStandIn(entity_counts={'files': args.count}) as stand_in:
+        url = stand_in.envelope_url() + '/files'
+        session = http_client.session()
+        body_size = len(session.get(url).content)
+
+        def whole_body():
+            response = session.get(url)
+            return [file['uuid']['uuid'] for file in response.json()['_embedded']['files']]
+
+        def streamed():
+            return [file['uuid']['uuid'] for file in hal_stream.stream_entities(session, url, 'files',
+                                                                                fields=('uuid.uuid',))]
+
+        print(f'listing of {args.count} files, {body_size / 2 ** 20:.0f} MB')
+        print(f'{"":<14} {"uuids":>8} {"seconds":>8} {"peak (MB)":>10}')
+        for name, read_uuids in (('r.json()', whole_body), ('streamed', streamed)):
+            count, seconds, peak = measure(read_uuids)
+            print(f'{name:<14} {count:>8} {seconds:>8.1f} {peak / 2 ** 20:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import random
+import time
+import tracemalloc
+import uuid as uuidlib
+
+from tests import verification
+
+
+def uuids(indices):
+    return (str(uuidlib.UUID(int=index + 1)) for index in indices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify a large process to file link graph in bounded memory.')
+    parser.add_argument('--edges', type=int, default=1000000)
+    parser.add_argument('--max-in-memory', type=int, default=100000)
+    args = parser.parse_args()
+
+    # the server returns the links in a different order, drops 5 of them and adds 3 that should not be there
+    expected = list(range(args.edges))
+    actual = expected[5:] + list(range(args.edges, args.edges + 3))
+    random.shuffle(actual)
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    diff = verification.compare(uuids(expected), uuids(actual), description='process -> file links',
+                                max_in_memory=args.max_in_memory)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(diff)
+    print(f'{seconds:.1f} seconds, peak {(peak - baseline) / 2 ** 20:.1f} MB above the generated edge indices')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+
+from tests import config, progress
+
+
+class Checkpoint:
+    """
+    The stages a multi-stage scenario has completed against a deployment and what it needs to carry on from them, e.g.
+    envelope URLs, upload credentials and bundle FQIDs. It is saved after every stage, so that a rerun after a late
+    failure can reattach to the envelopes already made rather than start again. Without a path nothing is saved and
+    every run starts from scratch. A checkpoint last saved more than max_age seconds ago is discarded rather than
+    resumed, since the envelopes it names may since have been cleaned up.
+
+    Checkpoints hold upload area credentials, so they are written readable by their owner only.
+    """
+
+    def __init__(self, path=None, scenario=None, deployment=None):
+        self.path = path
+        self.scenario = scenario
+        self.deployment = deployment
+        self.stages = []
+        self.values = {}
+        self.updated_at = None
+
+    @staticmethod
+    def for_scenario(scenario, deployment, directory=None, max_age=None):
+        """
+        The checkpoint left by the last run of scenario against deployment, or a new one if there is none or it is
+        older than max_age seconds, INGEST_CHECKPOINT_MAX_AGE_HOURS by default
+        """
+        directory = directory or config.checkpoint_dir
+        max_age = max_age if max_age is not None else config.checkpoint_max_age
+        if not directory:
+            return Checkpoint(scenario=scenario, deployment=deployment)
+        path = os.path.join(directory, f'{scenario}-{deployment}.json')
+        if os.path.exists(path):
+            checkpoint = Checkpoint.load(path)
+            if checkpoint.age() <= max_age:
+                return checkpoint
+            checkpoint.discard(f'it was last saved {checkpoint.age() / 3600:.1f}h ago')
+        return Checkpoint(path, scenario=scenario, deployment=deployment)
+
+    @staticmethod
+    def load(path):
+        with open(path) as f:
+            source = json.load(f)
+        checkpoint = Checkpoint(path, scenario=source.get('scenario'), deployment=source.get('deployment'))
+        checkpoint.stages = list(source.get('stages', []))
+        checkpoint.values = dict(source.get('values', {}))
+        checkpoint.updated_at = source.get('updated_at')
+        return checkpoint
+
+    def age(self, now=None):
+        """ Seconds since the checkpoint was last saved, infinite if that is not known """
+        if self.updated_at is None:
+            return float('inf')
+        return (now or time.time()) - self.updated_at
+
+    @property
+    def stage(self):
+        """ The last stage completed, None if there is none """
+        return self.stages[-1] if self.stages else None
+
+    def done(self, stage):
+        return stage in self.stages
+
+    def complete(self, stage, **values):
+        """ Record that stage is complete along with what later stages need from it, and save """
+        if stage not in self.stages:
+            self.stages.append(stage)
+        self.values.update(values)
+        self.save()
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def save(self):
+        self.updated_at = time.time()
+        if not self.path:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        partial = f'{self.path}.partial'
+        descriptor = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(descriptor, 'w') as f:
+            json.dump({'scenario': self.scenario, 'deployment': self.deployment, 'stages': self.stages,
+                       'values': self.values, 'updated_at': self.updated_at}, f, indent=2)
+        os.replace(partial, self.path)  # a crash mid-write leaves the previous checkpoint intact
+        return self.path
+
+    def delete(self):
+        """ Forget the checkpoint once the scenario has finished, so that the next run starts from scratch """
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.stages = []
+        self.values = {}
+
+    def discard(self, reason):
+        """ Delete a checkpoint that cannot be resumed from, so that the scenario starts from scratch """
+        progress.report(f'discarding checkpoint {self.path} after stage {self.stage}: {reason}', level=progress.WARNING)
+        self.delete()
@@ -1,3 +1,62 @@
 import os
 
-deployment = os.environ.get('DEPLOYMENT_ENV', None)
\ No newline at end of file
+deployment = os.environ.get('DEPLOYMENT_ENV', None)
+
+# directory that request latencies, stage timings and envelope state durations are exported to after each test
+metrics_dir = os.environ.get('INGEST_METRICS_DIR', None)
+
+# directory that the submission state timeline of every envelope a test polled is saved to
+timeline_dir = os.environ.get('INGEST_TIMELINE_DIR', None)
+
+# lowest level of progress message written to the console, e.g. DEBUG to see every poll
+progress_level = os.environ.get('INGEST_PROGRESS_LEVEL', 'INFO')
+
+# file that every progress event is appended to as a line of JSON
+progress_log = os.environ.get('INGEST_PROGRESS_LOG', None)
+
+# seconds a whole scenario may take, shared by every wait, HTTP call and subprocess it makes; unlimited if unset
+scenario_budget = float(os.environ['INGEST_SCENARIO_BUDGET']) if os.environ.get('INGEST_SCENARIO_BUDGET') else None
+
+# directory that sampled CPU and wall-clock profiles of each test are written to; profiling is off if unset
+profile_dir = os.environ.get('INGEST_PROFILE_DIR', None)
+
+# seconds between profiler samples
+profile_interval = float(os.environ.get('INGEST_PROFILE_INTERVAL', '0.01'))
+
+# directory that the entity graph snapshots taken by update runs are saved to
+snapshot_dir = os.environ.get('INGEST_SNAPSHOT_DIR', None)
+
+# SQLite database that the measurements of every run are added to, for querying trends with python -m tests.results
+results_db = os.environ.get('INGEST_RESULTS_DB', None)
+
+# whether HTTP calls are paced by tests.traffic, on unless set to off
+traffic_control = os.environ.get('INGEST_TRAFFIC_CONTROL', 'on') != 'off'
+
+# requests a second allowed to each host per endpoint class, e.g. poll=5,list=20,write=50,upload=2
+traffic_rates = {endpoint: float(rate) for endpoint, _, rate in
+                 (item.partition('=') for item in os.environ.get('INGEST_TRAFFIC_RATES',
+                                                                 'poll=5,list=20,write=50,upload=2').split(','))}
+
+# most requests in flight to a host at once; the traffic controller adapts its limit below this
+traffic_max_concurrency = int(os.environ.get('INGEST_TRAFFIC_MAX_CONCURRENCY', '64'))
+
+# times a request rejected with 429 or 503 is retried, waiting as long as its Retry-After asks
+traffic_max_retries = int(os.environ.get('INGEST_TRAFFIC_MAX_RETRIES', '5'))
+
+# directory that multi-stage scenarios checkpoint to after each stage, so that a rerun resumes where the last one failed
+checkpoint_dir = os.environ.get('INGEST_CHECKPOINT_DIR', None)
+
+# hours after which a checkpoint is too old to resume from and the scenario starts from scratch
+checkpoint_max_age = float(os.environ.get('INGEST_CHECKPOINT_MAX_AGE_HOURS', '24')) * 3600
+
+# directory holding the pools of completed primary submissions that scenarios needing one take from; unused if unset
+pool_dir = os.environ.get('INGEST_POOL_DIR', None)
+
+# completed primary submissions to keep in each deployment's pool
+pool_size = int(os.environ.get('INGEST_POOL_SIZE', '2'))
+
+# hours after which a pooled submission is too old to hand out
+pool_max_age = float(os.environ.get('INGEST_POOL_MAX_AGE_HOURS', '24')) * 3600
+
+# whether taking a submission from a pool starts topping it up again in the background, on unless set to off
+pool_refill = os.environ.get('INGEST_POOL_REFILL', 'on') != 'off'
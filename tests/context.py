@@ -0,0 +1,40 @@
+import threading
+
+try:
+    import contextvars
+except ImportError:  # Python < 3.7 has no context variables, fall back to thread locals
+    contextvars = None
+
+
+class ContextLocal:
+    """
+    A value that is local to the current thread and, where the interpreter supports it, to the current asyncio task.
+    Before Python 3.7 there are no context variables and the value is only thread local, so asyncio tasks running
+    concurrently in one thread share it.
+    """
+
+    def __init__(self, name, default=None):
+        self.default = default
+        if contextvars:
+            self._var = contextvars.ContextVar(name, default=default)
+        else:
+            self._local = threading.local()
+
+    def get(self):
+        if contextvars:
+            return self._var.get()
+        return getattr(self._local, 'value', self.default)
+
+    def set(self, value):
+        """ Set the value and return a token that restores the previous value when passed to reset """
+        if contextvars:
+            return self._var.set(value)
+        token = self.get()
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        if contextvars:
+            self._var.reset(token)
+        else:
+            self._local.value = token
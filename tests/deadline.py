@@ -0,0 +1,135 @@
+import asyncio
+import time
+from functools import wraps
+
+from tests.context import ContextLocal
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    """
+    A time budget for a block of work, e.g. a whole scenario, that every wait and HTTP call made within it respects.
+    Deadlines nest: an inner deadline can only shorten the budget of the one it was entered within, and cancelling an
+    outer deadline expires every deadline nested in it. The current deadline is tracked per thread and, from Python
+    3.7, per asyncio task; use propagate to carry it into worker threads. On Python 3.6 concurrent tasks in one thread
+    share a single stack of deadlines, so only enter deadlines in one task at a time there.
+
+    Deadlines are cooperative. Unlike an alarm signal they do not interrupt running code; the budget is enforced at
+    every HTTP call, WaitFor poll, sleep and subprocess the harness makes.
+    """
+
+    def __init__(self, seconds=None, name=None):
+        self.seconds = seconds
+        self.name = name or 'deadline'
+        self.parent = None
+        self.expires_at = None
+        self.cancelled = False
+        self._tokens = []
+
+    def start(self):
+        self.parent = current()
+        own_expiry = time.monotonic() + self.seconds if self.seconds is not None else None
+        parent_expiry = self.parent.expires_at if self.parent else None
+        candidates = [expiry for expiry in (own_expiry, parent_expiry) if expiry is not None]
+        self.expires_at = min(candidates) if candidates else None
+        self._tokens.append(_current.set(self))
+        return self
+
+    def finish(self):
+        _current.reset(self._tokens.pop())
+
+    def cancel(self):
+        self.cancelled = True
+
+    def remaining(self):
+        """ Seconds left, None if there is no limit """
+        if self.is_cancelled():
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() == 0.0
+
+    def is_cancelled(self):
+        return self.cancelled or (self.parent is not None and self.parent.is_cancelled())
+
+    def check(self):
+        if self.expired():
+            reason = 'was cancelled' if self.is_cancelled() else f'ran out after {self.seconds} seconds'
+            raise DeadlineExceeded(f'{self.name} {reason}')
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.finish()
+        return False
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.finish()
+        return False
+
+
+_current = ContextLocal('deadline', default=None)
+
+
+def current() -> Deadline:
+    """ The innermost deadline entered in this thread or task, None if the work is unbounded """
+    return _current.get()
+
+
+def remaining():
+    deadline = current()
+    return deadline.remaining() if deadline else None
+
+
+def check():
+    deadline = current()
+    if deadline:
+        deadline.check()
+
+
+def timeout(default=None):
+    """ A timeout for a single blocking call: default, shortened to what is left of the current deadline """
+    left = remaining()
+    if left is None:
+        return default
+    return left if default is None else min(default, left)
+
+
+def sleep(seconds):
+    """ Sleep for seconds, or until the current deadline expires, whichever is sooner """
+    check()
+    time.sleep(timeout(seconds))
+    check()
+
+
+async def wait(awaitable):
+    """ Await awaitable within whatever is left of the current deadline """
+    check()
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining())
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(f'{current().name} ran out while awaiting') from e
+
+
+def propagate(func):
+    """ Wrap func so that it runs within the deadline current now, e.g. when it is handed to a thread pool """
+    deadline = current()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current.set(deadline)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
@@ -0,0 +1,84 @@
+import os
+from contextlib import contextmanager
+
+from tests.context import ContextLocal
+from tests.ingest_agents import AnonymousAuthAgent, IngestApiAgent, IngestAuthAgent, IngestUIAgent
+
+DEPLOYMENTS = ('dev', 'integration', 'staging')
+
+
+class Deployment:
+    """
+    Where a deployment's Ingest API and broker are and how to authenticate with them. Each agent a Deployment makes
+    has its own connection pool and token. If config_home is set, hca CLI commands run for the deployment keep their
+    configuration, including the selected upload area, there rather than in the user's ~/.config.
+    """
+
+    def __init__(self, name, api_url=None, broker_url=None, authenticated=True, config_home=None):
+        self.name = name
+        self.api_url = api_url or IngestApiAgent.INGEST_API_URL_TEMPLATE.format(name)
+        self.broker_url = broker_url or IngestUIAgent.INGEST_UI_URL_TEMPLATE.format(name)
+        self.authenticated = authenticated
+        self.config_home = config_home
+
+    @staticmethod
+    def parse(spec):
+        """ A deployment from 'staging', or from 'name=http://host:port' for an unauthenticated one, e.g. a stand-in """
+        name, _, url = spec.partition('=')
+        if url:
+            return Deployment(name, api_url=url.rstrip('/'), broker_url=url.rstrip('/'), authenticated=False)
+        return Deployment(name)
+
+    def spec(self):
+        """ The 'name' or 'name=URL' that parse reads back as this deployment, e.g. for a subprocess's command line """
+        return self.name if self.authenticated else f'{self.name}={self.api_url}'
+
+    def auth_agent(self):
+        return IngestAuthAgent() if self.authenticated else AnonymousAuthAgent()
+
+    def api_agent(self) -> IngestApiAgent:
+        return IngestApiAgent(self.name, url=self.api_url, auth_agent=self.auth_agent())
+
+    def ui_agent(self) -> IngestUIAgent:
+        return IngestUIAgent(self.name, url=self.broker_url, auth_agent=self.auth_agent())
+
+    def with_config_home(self, config_home):
+        """ A copy of this deployment whose hca CLI commands keep their configuration in config_home """
+        return Deployment(self.name, api_url=self.api_url, broker_url=self.broker_url,
+                          authenticated=self.authenticated, config_home=config_home)
+
+    def command_environment(self):
+        """ The environment for subprocesses run against this deployment, None to inherit this process's """
+        if not self.config_home:
+            return None
+        return dict(os.environ, XDG_CONFIG_HOME=self.config_home)
+
+    def __repr__(self):
+        return f'Deployment({self.name!r}, api_url={self.api_url!r})'
+
+
+def resolve(deployment) -> Deployment:
+    """ deployment itself if it is a Deployment, otherwise the standard deployment of that name """
+    return deployment if isinstance(deployment, Deployment) else Deployment(deployment)
+
+
+_current = ContextLocal('deployment', default=None)
+
+
+def current() -> Deployment:
+    """ The deployment activated in the current thread or task, if any """
+    return _current.get()
+
+
+def command_environment():
+    deployment = current()
+    return deployment.command_environment() if deployment else None
+
+
+@contextmanager
+def activate(deployment: Deployment):
+    token = _current.set(deployment)
+    try:
+        yield deployment
+    finally:
+        _current.reset(token)
@@ -0,0 +1,112 @@
+def _uuid(resource):
+    return (resource.get('uuid') or {}).get('uuid')  # because uuid's are structured as uuid.uuid in the source JSON
+
+
+def _self_url(resource):
+    return ((resource.get('_links') or {}).get('self') or {}).get('href')
+
+
+class Entity:
+    """
+    A lightweight view of an entity Ingest returns. Views keep only the handful of fields the harness reads instead of
+    the whole HAL document, so that listings of very large submissions can be held, or streamed through, cheaply.
+    """
+
+    __slots__ = ('uuid', 'url')
+
+    # the parts of the source JSON a view is built from, so listings can be projected down to them while parsing
+    FIELDS = ('uuid.uuid', '_links.self.href')
+
+    def __init__(self, uuid, url=None):
+        self.uuid = uuid
+        self.url = url
+
+    @classmethod
+    def from_resource(cls, resource: dict):
+        return cls(_uuid(resource), url=_self_url(resource))
+
+    @classmethod
+    def stream(cls, resources):
+        """ Build views one at a time from an iterable of resources, e.g. the pages of a listing """
+        return (cls.from_resource(resource) for resource in resources)
+
+    def get_uuid(self):
+        return self.uuid
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.uuid == other.uuid
+
+    def __hash__(self):
+        return hash(self.uuid)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.uuid!r})'
+
+
+class Project(Entity):
+    __slots__ = ()
+
+
+class Biomaterial(Entity):
+    __slots__ = ()
+
+
+class Process(Entity):
+    __slots__ = ()
+
+
+class Protocol(Entity):
+    __slots__ = ()
+
+
+class File(Entity):
+    __slots__ = ('data_file_uuid', 'file_name')
+
+    FIELDS = Entity.FIELDS + ('dataFileUuid', 'fileName')
+
+    def __init__(self, uuid, url=None, data_file_uuid=None, file_name=None):
+        super().__init__(uuid, url=url)
+        self.data_file_uuid = data_file_uuid
+        self.file_name = file_name
+
+    @classmethod
+    def from_resource(cls, resource: dict):
+        return cls(_uuid(resource), url=_self_url(resource), data_file_uuid=resource.get('dataFileUuid'),
+                   file_name=resource.get('fileName'))
+
+
+class BundleManifest:
+    __slots__ = ('uuid', 'version', 'envelope_uuid')
+
+    FIELDS = ('bundleUuid', 'bundleVersion', 'envelopeUuid')
+
+    def __init__(self, uuid, version=None, envelope_uuid=None):
+        self.uuid = uuid
+        self.version = version
+        self.envelope_uuid = envelope_uuid
+
+    @classmethod
+    def from_resource(cls, resource: dict):
+        return cls(resource.get('bundleUuid'), version=resource.get('bundleVersion'),
+                   envelope_uuid=resource.get('envelopeUuid'))
+
+    @classmethod
+    def stream(cls, resources):
+        return (cls.from_resource(resource) for resource in resources)
+
+    @property
+    def fqid(self):
+        return f'{self.uuid}.{self.version}'
+
+    def __repr__(self):
+        return f'BundleManifest({self.fqid!r})'
+
+
+VIEWS = {
+    'projects': Project,
+    'biomaterials': Biomaterial,
+    'processes': Process,
+    'protocols': Protocol,
+    'files': File,
+    'bundleManifests': BundleManifest
+}
@@ -0,0 +1,122 @@
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+from tests import deployments, progress
+from tests.deployments import Deployment
+from tests.harness import HarnessRun
+from tests.scenarios import SCENARIOS
+from tests.stand_in import IngestStandIn
+
+
+class DeploymentResult:
+
+    def __init__(self, deployment: Deployment, harness_run: HarnessRun):
+        self.deployment = deployment
+        self.harness_run = harness_run
+        self.error = None
+
+    @property
+    def seconds(self):
+        return self.harness_run.finished_at - self.harness_run.started_at
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def run(scenario_name, targets: list, budget_seconds=None) -> list:
+    """
+    Run a scenario against every deployment in targets at the same time, each in its own thread with its own
+    HarnessRun, agents and hca CLI configuration, and return a DeploymentResult for each, in the order of targets.
+    """
+    func = SCENARIOS[scenario_name]
+    results = [DeploymentResult(target, HarnessRun(scenario_name, target.name, budget_seconds=budget_seconds))
+               for target in targets]
+
+    def run_one(result: DeploymentResult):
+        target = result.deployment
+        with ExitStack() as stack:
+            if target.config_home is None:  # keeps the upload area each deployment selects apart from the others
+                target.config_home = stack.enter_context(tempfile.TemporaryDirectory(prefix=f'hca-{target.name}-'))
+                stack.callback(setattr, target, 'config_home', None)
+            stack.enter_context(deployments.activate(target))
+            result.harness_run.start()
+            try:
+                func(target)
+            except Exception as e:
+                result.error = e
+                progress.current().error(f'{scenario_name} failed on {target.name}: {e!r}')
+            finally:
+                result.harness_run.finish(outcome='passed' if result.ok else 'failed')
+
+    threads = [threading.Thread(target=run_one, args=(result,), name=f'fan-out-{result.deployment.name}')
+               for result in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def comparison(results: list) -> str:
+    """ A table of the latency and throughput of each deployment side by side """
+    names = [result.deployment.name for result in results]
+    summaries = [result.harness_run.metrics.to_json() for result in results]
+    width = max([12] + [len(name) for name in names])
+    rows = [[''] + names]
+
+    def row(label, values):
+        rows.append([label] + [value if isinstance(value, str) else f'{value:.3f}' if value is not None else '-'
+                               for value in values])
+
+    row('outcome', ['ok' if result.ok else 'failed' for result in results])
+    row('seconds', [result.seconds for result in results])
+    requests = [sum(stats['latency_seconds']['count'] for stats in summary['endpoints'].values())
+                for summary in summaries]
+    row('requests', [str(count) for count in requests])
+    row('requests/s', [count / result.seconds if result.seconds else None for count, result in zip(requests, results)])
+    row('errors', [str(sum(stats['errors'] for stats in summary['endpoints'].values())) for summary in summaries])
+    for stage in sorted({stage for summary in summaries for stage in summary['stages']}):
+        row(f'{stage} s', [summary['stages'][stage]['sum'] if stage in summary['stages'] else None
+                           for summary in summaries])
+    for endpoint in sorted({endpoint for summary in summaries for endpoint in summary['endpoints']}):
+        for q, name in (('0.5', 'p50'), ('0.95', 'p95')):
+            row(f'{endpoint} {name}', [summary['endpoints'][endpoint]['latency_seconds']['quantiles'][q]
+                                       if endpoint in summary['endpoints'] else None for summary in summaries])
+
+    label_width = max(len(r[0]) for r in rows)
+    return '\n'.join(f'{r[0]:<{label_width}}  ' + '  '.join(f'{cell:>{width}}' for cell in r[1:]) for r in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a scenario against several deployments at once and compare them.')
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    parser.add_argument('deployments', nargs='*', metavar='deployment',
+                        help="a deployment name, e.g. staging, or name=URL for an unauthenticated deployment")
+    parser.add_argument('--stand-in', action='append', default=[], metavar='NAME=LATENCY',
+                        help='start a local stand-in adding LATENCY seconds to every response and run against it too')
+    parser.add_argument('--budget', type=float, default=None, help='seconds each deployment may take')
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        targets = [Deployment.parse(spec) for spec in args.deployments]
+        for spec in args.stand_in:
+            name, _, latency = spec.partition('=')
+            stand_in = stack.enter_context(IngestStandIn(latency=float(latency or 0)))
+            targets.append(Deployment(name, api_url=stand_in.url, broker_url=stand_in.url, authenticated=False))
+        if not targets:
+            parser.error('give at least one deployment or --stand-in')
+        start = time.time()
+        results = run(args.scenario, targets, budget_seconds=args.budget)
+        progress.flush()
+        print(f'{args.scenario} on {len(targets)} deployments in {time.time() - start:.1f}s')
+        print(comparison(results))
+    sys.exit(0 if all(result.ok for result in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
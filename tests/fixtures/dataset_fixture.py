@@ -1,5 +1,7 @@
 import json
 import os
+import tempfile
+import weakref
 
 import requests
 
@@ -37,15 +39,21 @@ class DatasetFixture:
             self.config = json.load(json_data)
             self.config["spreadsheet_location"] = self.config[
                 "spreadsheet_location"].replace("DEPLOYMENT", branch)
-        self._download_spreadsheet()
 
     def _download_spreadsheet(self):
+        # each fixture downloads to a file of its own, removed along with the fixture, so that fixtures used at once
+        # in other threads or processes never read a spreadsheet another one is still writing
         response = requests.get(self.config["spreadsheet_location"])
-        with open(self.metadata_spreadsheet_path, 'wb') as f:
+        descriptor, path = tempfile.mkstemp(prefix=f'{self.name}.{self.deployment}.', suffix='.xlsx')
+        weakref.finalize(self, os.remove, path)
+        with open(descriptor, 'wb') as f:
             f.write(response.content)
+        return path
 
     @property
     def metadata_spreadsheet_path(self):
-        filename = self.name + '.xlsx'
-        return os.path.join(self.dataset_path, filename)
+        """ The dataset's metadata spreadsheet, downloaded when first asked for """
+        if self._spreadsheet is None:
+            self._spreadsheet = self._download_spreadsheet()
+        return self._spreadsheet
 
@@ -0,0 +1,47 @@
+import uuid as uuidlib
+from os import path
+
+from tests.fixtures.util import load_file
+
+_dir_path = path.dirname(path.realpath(__file__))
+_CONTENT = {
+    'biomaterials': f'{_dir_path}/metadata/donor_organism.json',
+    'files': f'{_dir_path}/metadata/sequence_file.json'
+}
+
+
+class HalFixture:
+    """
+    Synthetic HAL documents shaped like the ones Ingest returns, for exercising the harness at production scale
+    without a deployment.
+    """
+
+    def __init__(self, base_url='http://localhost'):
+        self.base_url = base_url
+        self._content = {entity_type: load_file(location) for entity_type, location in _CONTENT.items()}
+
+    def entity(self, entity_type, index):
+        entity_uuid = str(uuidlib.UUID(int=index + 1))
+        entity_id = f'{index:024x}'
+        url = f'{self.base_url}/{entity_type}/{entity_id}'
+        resource = {
+            'content': self._content.get(entity_type, {'schema_type': entity_type}),
+            'submissionDate': '2019-06-01T12:00:00.000Z',
+            'updateDate': '2019-06-01T12:00:00.000Z',
+            'uuid': {'uuid': entity_uuid},
+            'validationState': 'Valid',
+            'validationErrors': [],
+            '_links': {
+                'self': {'href': url},
+                entity_type[:-1]: {'href': url},
+                'submissionEnvelopes': {'href': f'{url}/submissionEnvelopes'},
+                'project': {'href': f'{url}/project'}
+            }
+        }
+        if entity_type == 'files':
+            resource['fileName'] = f'file_{index}.fastq.gz'
+            resource['dataFileUuid'] = str(uuidlib.UUID(int=(1 << 64) + index))
+        return resource
+
+    def entities(self, entity_type, count):
+        return (self.entity(entity_type, index) for index in range(count))
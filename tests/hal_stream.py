@@ -0,0 +1,162 @@
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class JsonStream:
+    """
+    Reads JSON values one at a time from an iterable of byte chunks, e.g. Response.iter_content, holding no more of
+    the document in memory than the value being read.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._position = 0
+        self._exhausted = False
+
+    def _fill(self):
+        if self._exhausted:
+            return False
+        if self._position:
+            self._buffer = self._buffer[self._position:]
+            self._position = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        self._buffer += self._decoder.decode(b'', final=True)
+        self._exhausted = True
+        return False
+
+    def peek(self):
+        """ The next non-whitespace character, without consuming it; '' at the end of the document """
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in _WHITESPACE:
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return ''
+
+    def expect(self, *characters):
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(f'Expected one of {characters} in JSON stream but found {character!r}')
+        self._position += 1
+        return character
+
+    def read_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self._buffer) and not self._exhausted and self._fill():
+                continue  # a number or literal may carry on in the next chunk
+            self._position = end
+            return value
+
+    def skip_value(self):
+        self.read_value()
+
+
+class HalPage:
+    """
+    A single page of a HAL listing, read incrementally. Iterating yields the entities in _embedded.<entity_type> one
+    at a time; the page's _links and page details are available once iteration is complete.
+    """
+
+    def __init__(self, chunks, entity_type, fields=None):
+        self.stream = JsonStream(chunks)
+        self.entity_type = entity_type
+        self.fields = fields
+        self.links = {}
+        self.page = {}
+
+    def __iter__(self):
+        stream = self.stream
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.read_value()
+            stream.expect(':')
+            if key == '_embedded':
+                yield from self._read_embedded()
+            elif key == '_links':
+                self.links = stream.read_value()
+            elif key == 'page':
+                self.page = stream.read_value()
+            else:
+                stream.skip_value()
+            if stream.expect(',', '}') == '}':
+                return
+
+    def _read_embedded(self):
+        stream = self.stream
+        stream.expect('{')
+        if stream.peek() == '}':
+            stream.expect('}')
+            return
+        while True:
+            key = stream.read_value()
+            stream.expect(':')
+            if key == self.entity_type:
+                yield from self._read_entities()
+            else:
+                stream.skip_value()
+            if stream.expect(',', '}') == '}':
+                return
+
+    def _read_entities(self):
+        stream = self.stream
+        stream.expect('[')
+        if stream.peek() == ']':
+            stream.expect(']')
+            return
+        while True:
+            entity = stream.read_value()
+            yield project(entity, self.fields) if self.fields else entity
+            if stream.expect(',', ']') == ']':
+                return
+
+
+def project(document: dict, fields):
+    """ A copy of document holding only the given dotted paths, e.g. ('uuid.uuid', 'dataFileUuid') """
+    projected = {}
+    for field in fields:
+        keys = field.split('.')
+        value = document
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = projected
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+    return projected
+
+
+def stream_entities(session, url, entity_type, fields=None, headers=None, follow=True):
+    """
+    Yield the entities of a HAL listing one at a time, parsing each response as it arrives rather than loading the
+    whole body, and following next links from page to page unless follow is False.
+    """
+    while url:
+        with session.get(url, headers=headers, stream=True) as r:
+            r.raise_for_status()
+            page = HalPage(r.iter_content(CHUNK_SIZE), entity_type, fields=fields)
+            yield from page
+        url = page.links.get('next', {}).get('href') if follow else None
@@ -0,0 +1,73 @@
+import os
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from tests import config, deadline, metrics, profiling, progress, results, timeline
+
+
+class HarnessRun:
+    """
+    One scenario run against one deployment. While started, the metrics, envelope state timelines, progress events
+    and time budget of everything done in the current thread belong to this run, and the run is profiled if
+    INGEST_PROFILE_DIR is set. Once finished, what it measured is added to the results database if INGEST_RESULTS_DB
+    is set.
+    """
+
+    def __init__(self, scenario, deployment, budget_seconds=None):
+        self.scenario = scenario
+        self.deployment = deployment
+        labels = {'scenario': scenario, 'deployment': deployment}
+        self.metrics = metrics.Metrics(labels=labels)
+        self.timeline = timeline.TimelineRecorder(metadata=labels)
+        self.progress = progress.Run(name=f'{scenario}@{deployment}', **labels)
+        self.deadline = deadline.Deadline(budget_seconds if budget_seconds is not None else config.scenario_budget,
+                                          name=scenario)
+        self.started_at = None
+        self.finished_at = None
+        self._contexts = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._contexts = ExitStack()
+        self._contexts.enter_context(metrics.activate(self.metrics))
+        self._contexts.enter_context(timeline.activate(self.timeline))
+        self._contexts.enter_context(self.progress)
+        self._contexts.enter_context(self.deadline)
+        self._contexts.enter_context(profiling.profile(self.scenario))
+        return self
+
+    def finish(self, outcome=None):
+        self._contexts.close()
+        self.finished_at = time.time()
+        if config.metrics_dir:
+            self.metrics.export(os.path.join(config.metrics_dir, self.scenario))
+        if config.timeline_dir:
+            self.timeline.save(config.timeline_dir)
+        if config.results_db:
+            store = results.ResultStore(config.results_db)
+            try:
+                store.record_run(self, outcome=outcome)
+            finally:
+                store.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.finish(outcome='passed' if exc_type is None else 'failed')
+        return False
+
+
+def harness_test(test_method):
+    """
+    Run a unittest test method in a HarnessRun named after the test, against the test case's deployment, and record
+    whether it passed. The run is available to the test as self.harness_run.
+    """
+
+    @wraps(test_method)
+    def run_test(test_case, *args, **kwargs):
+        with HarnessRun(test_case.id(), test_case.deployment) as test_case.harness_run:
+            return test_method(test_case, *args, **kwargs)
+
+    return run_test
@@ -0,0 +1,126 @@
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tests import config, deadline, metrics, traffic
+
+
+class HarnessSession(requests.Session):
+    """
+    A requests Session that every HTTP call made by the agents goes through, so that each call is measured, bounded by
+    the current deadline and paced by the traffic controller for its host. Calls the server rejects with 429 or 503
+    are retried once whatever Retry-After it gave has passed, as long as that is within the deadline. Each attempt is
+    recorded as a request of its own, and every attempt after the first also counts as a retry of its endpoint.
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        endpoint = metrics.endpoint_name(method, url)
+        timeout = kwargs.get('timeout')
+        attempt = 0
+        while True:
+            deadline.check()
+            if not isinstance(timeout, tuple):  # (connect, read) timeouts are left as they were given
+                kwargs['timeout'] = deadline.timeout(timeout)
+            response = self._send(endpoint, attempt, method, url, *args, **kwargs)
+            if response.status_code not in traffic.OVERLOADED_STATUSES:
+                return response
+            wait = traffic.backoff(response, attempt)
+            if wait is None:
+                return response
+            response.close()
+            traffic.wait_out(url, wait)
+            _rewind(kwargs)
+            attempt += 1
+
+    def _send(self, endpoint, attempt, method, url, *args, **kwargs):
+        retried = 1 if attempt else 0
+        with traffic.admit(method, url) as outcome:
+            start = time.perf_counter()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except requests.RequestException as e:
+                outcome['overloaded'] = isinstance(e, requests.Timeout)
+                metrics.current().record_request(endpoint, time.perf_counter() - start, error=True, retries=retried)
+                if isinstance(e, requests.Timeout) and deadline.remaining() == 0.0:
+                    raise deadline.DeadlineExceeded(f'{method} {url} did not complete within the deadline') from e
+                raise
+            outcome['latency'] = time.perf_counter() - start
+            outcome['overloaded'] = response.status_code in traffic.OVERLOADED_STATUSES
+        metrics.current().record_request(endpoint, outcome['latency'],
+                                         status=response.status_code,
+                                         retries=_retries(response) + retried,
+                                         bytes_out=_request_size(response.request),
+                                         bytes_in=_response_size(response, kwargs.get('stream', False)))
+        return response
+
+
+# server errors retried by sessions that ask for it; 429 and 503 are left to the traffic controller
+SERVER_ERROR_STATUSES = (500, 502, 504)
+
+
+def session(retry_server_errors=False):
+    harness_session = HarnessSession()
+    # enough pooled connections for as many requests as the traffic controller may let through at once
+    adapter = HTTPAdapter(pool_maxsize=config.traffic_max_concurrency,
+                          max_retries=_server_error_retry() if retry_server_errors else 0)
+    harness_session.mount('http://', adapter)
+    harness_session.mount('https://', adapter)
+    return harness_session
+
+
+def instrument(ingest_client_api):
+    """
+    Send the requests of ingest's IngestApi client, e.g. creating and linking entities, through a HarnessSession in
+    place of its own session, so that they are measured and paced along with the agents' requests
+    """
+    ingest_client_api.session.close()
+    ingest_client_api.session = session(retry_server_errors=True)
+    return ingest_client_api
+
+
+def _server_error_retry(total=5, backoff_factor=0.5):
+    settings = dict(total=total, backoff_factor=backoff_factor, status_forcelist=SERVER_ERROR_STATUSES,
+                    raise_on_status=False)
+    try:
+        return Retry(allowed_methods=None, **settings)  # retry every method, as ingest's create_session_with_retry did
+    except TypeError:  # urllib3 before 1.26
+        return Retry(method_whitelist=False, **settings)
+
+
+def _rewind(kwargs):
+    """ Seek file objects being uploaded back to their start so that the request can be sent again """
+    for value in (kwargs.get('files') or {}).values():
+        file = value[1] if isinstance(value, tuple) else value
+        if hasattr(file, 'seek'):
+            file.seek(0)
+    if hasattr(kwargs.get('data'), 'seek'):
+        kwargs['data'].seek(0)
+
+
+def _retries(response):
+    retries = getattr(response.raw, 'retries', None)
+    history = getattr(retries, 'history', None)
+    return len(history) if history else 0
+
+
+def _request_size(prepared_request):
+    body = prepared_request.body if prepared_request is not None else None
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    try:
+        return len(body)
+    except TypeError:  # streamed upload of unknown size
+        return int(prepared_request.headers.get('Content-Length', 0))
+
+
+def _response_size(response, stream):
+    content_length = response.headers.get('Content-Length')
+    if content_length is not None:
+        return int(content_length)
+    if stream:  # reading the body here would defeat the point of streaming it
+        return 0
+    return len(response.content)
@@ -1,21 +1,23 @@
 import json
 import os
-from copy import deepcopy
 
 import requests
 from ingest.utils.s2s_token_client import S2STokenClient
 from ingest.utils.token_manager import TokenManager
 
+from tests import entities, hal_stream, http_client
+
 
 class IngestUIAgent:
 
     INGEST_UI_URL_TEMPLATE = "https://ingest.{}.data.humancellatlas.org"
 
-    def __init__(self, deployment):
+    def __init__(self, deployment, url=None, auth_agent=None):
         self.deployment = deployment
-        self.ingest_broker_url = self.INGEST_UI_URL_TEMPLATE.format(self.deployment)
-        self.ingest_auth_agent = IngestAuthAgent()
+        self.ingest_broker_url = url or self.INGEST_UI_URL_TEMPLATE.format(self.deployment)
+        self.ingest_auth_agent = auth_agent or IngestAuthAgent()
         self.auth_headers = self.ingest_auth_agent.make_auth_header()
+        self.session = http_client.session()
 
     def upload(self, metadata_spreadsheet_path, is_update=False, project_uuid=None):
         url = self.ingest_broker_url + '/api_upload'
@@ -25,54 +27,65 @@ class IngestUIAgent:
         data = {}
         if project_uuid:
             data['projectUuid'] = project_uuid
-        files = {'file': open(metadata_spreadsheet_path, 'rb')}
-
-        response = requests.post(url, data=data, files=files, allow_redirects=False, headers=self.auth_headers)
+        with open(metadata_spreadsheet_path, 'rb') as spreadsheet:
+            response = self.session.post(url, data=data, files={'file': spreadsheet}, allow_redirects=False,
+                                         headers=self.auth_headers)
         if response.status_code != requests.codes.found and response.status_code != requests.codes.created:
             raise RuntimeError(f"POST {url} response was {response.status_code}: {response.content}")
         return json.loads(response.content)['details']['submission_id']
 
     def download(self, submission_uuid):
         url = self.ingest_broker_url + f'/submissions/{submission_uuid}/spreadsheet'
-        response = requests.get(url)
+        response = self.session.get(url)
         return response.content
 
+    def close(self):
+        self.session.close()
+
+
 class IngestApiAgent:
 
     INGEST_API_URL_TEMPLATE = "https://api.ingest.{}.data.humancellatlas.org"
 
-    def __init__(self, deployment):
+    def __init__(self, deployment, url=None, auth_agent=None):
         self.deployment = deployment
-        self.ingest_api_url = self.INGEST_API_URL_TEMPLATE.format(self.deployment)
-        self.ingest_auth_agent = IngestAuthAgent()
+        self.ingest_api_url = url or self.INGEST_API_URL_TEMPLATE.format(self.deployment)
+        self.ingest_auth_agent = auth_agent or IngestAuthAgent()
         self.auth_headers = self.ingest_auth_agent.make_auth_header()
+        self.session = http_client.session()
 
     def submissions(self):
+        return list(self.iter_submissions())
+
+    def iter_submissions(self, fields=None):
+        """ The first 1000 submission envelopes, parsed one at a time and optionally projected down to fields """
         url = self.ingest_api_url + '/submissionEnvelopes?size=1000'
-        response = requests.get(url, headers=self.auth_headers)
-        return response.json()['_embedded']['submissionEnvelopes']
+        return hal_stream.stream_entities(self.session, url, 'submissionEnvelopes', fields=fields,
+                                          headers=self.auth_headers, follow=False)
+
+    def create_envelope(self):
+        r = self.session.post(self.ingest_api_url + '/submissionEnvelopes', json={}, headers=self.auth_headers)
+        r.raise_for_status()
+        return self.envelope(url=r.json()['_links']['self']['href'])
 
     def envelope(self, envelope_id=None, url=None):
         return IngestApiAgent.SubmissionEnvelope(envelope_id=envelope_id, ingest_api_url=self.ingest_api_url,
-                                                 auth_headers=self.auth_headers, url=url)
+                                                 auth_headers=self.auth_headers, url=url, session=self.session)
 
-    class Project:
+    def close(self):
+        self.session.close()
 
-        def __init__(self, source: dict = {}):
-            self._source = deepcopy(source)
-
-        def get_uuid(self):
-            uuid = self._source.get('uuid')
-            return uuid.get('uuid') # because uuid's are structured as uuid.uuid in the source JSON
+    Project = entities.Project
 
     class SubmissionEnvelope:
 
-        def __init__(self, envelope_id=None, ingest_api_url=None, auth_headers=None, url=None):
+        def __init__(self, envelope_id=None, ingest_api_url=None, auth_headers=None, url=None, session=None):
             self.envelope_id = envelope_id
             self.url = url
             self.ingest_api_url = ingest_api_url
             self.data = None
             self.auth_headers = auth_headers
+            self.session = session or http_client.session()
             if envelope_id or url:
                 self._load()
 
@@ -92,17 +105,17 @@ class IngestApiAgent:
 
         def submit(self):
             submit_url = self.url + '/submissionEvent'
-            r = requests.put(submit_url, headers=self.auth_headers)
+            r = self.session.put(submit_url, headers=self.auth_headers)
             r.raise_for_status()
             return r
 
         def disable_indexing(self):
             do_not_index = {'triggersAnalysis': False}
-            requests.patch(self.url, data=json.dumps(do_not_index))
+            self.session.patch(self.url, data=json.dumps(do_not_index))
 
         def set_as_update_submission(self):
             do_not_index = {'isUpdate': True}
-            r = requests.patch(self.url, data=json.dumps(do_not_index), headers=self.auth_headers)
+            r = self.session.patch(self.url, data=json.dumps(do_not_index), headers=self.auth_headers)
             r.raise_for_status()
             return r
 
@@ -117,7 +130,7 @@ class IngestApiAgent:
             """
             Similar to get_projects but returns a list of Project objects instead of raw JSON.
             """
-            return [IngestApiAgent.Project(source=source) for source in self.get_projects()]
+            return list(self.views('projects'))
 
         def get_protocols(self):
             return self._get_entity_list('protocols')
@@ -131,15 +144,21 @@ class IngestApiAgent:
         def get_bundle_manifests(self):
             return self._get_entity_list('bundleManifests')
 
-        def _get_entity_list(self, entity_type):
+        def views(self, entity_type):
+            """ Lightweight views of the entities of entity_type, built one at a time as the listing is parsed """
+            view = entities.VIEWS[entity_type]
+            return view.stream(self.iter_entities(entity_type, fields=view.FIELDS))
+
+        def iter_entities(self, entity_type, fields=None):
+            """
+            The entities of entity_type as JSON, parsed one at a time from each page of the listing and optionally
+            projected down to fields, e.g. ('uuid.uuid',), so that memory use does not grow with the size of a page.
+            """
             url = self.data['_links'][entity_type]['href']
-            r = requests.get(url, headers=self.auth_headers)
-            r.raise_for_status()
-            files = r.json()
-            # TODO won't work for paginated result
-            result = files['_embedded'][entity_type] if files.get('_embedded') and files['_embedded'].get(entity_type) else []
-            return result
+            return hal_stream.stream_entities(self.session, url, entity_type, fields=fields, headers=self.auth_headers)
 
+        def _get_entity_list(self, entity_type):
+            return list(self.iter_entities(entity_type))
 
         @property
         def uuid(self):
@@ -149,7 +168,7 @@ class IngestApiAgent:
             if not self.url:
                 self.url = self.ingest_api_url + f'/submissionEnvelopes/{self.envelope_id}'
 
-            self.data = requests.get(self.url, headers=self.auth_headers).json()
+            self.data = self.session.get(self.url, headers=self.auth_headers).json()
 
 
 class IngestAuthAgent:
@@ -181,3 +200,9 @@ class IngestAuthAgent:
         }
         return headers
 
+
+class AnonymousAuthAgent:
+    """Stands in for IngestAuthAgent with deployments that take requests without a token, e.g. local stand-ins."""
+
+    def make_auth_header(self):
+        return {}
@@ -0,0 +1,221 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlparse
+
+from tests.context import ContextLocal
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_ID_SEGMENT = re.compile(r'^([0-9a-f]{24}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+)$',
+                         re.IGNORECASE)
+
+
+def endpoint_name(method, url):
+    """
+    Group a request with others that hit the same endpoint, e.g.
+    GET https://api.ingest.dev.data.humancellatlas.org/submissionEnvelopes/5c2e.../files?page=1
+    becomes "GET /submissionEnvelopes/{id}/files".
+    """
+    path = urlparse(url).path or '/'
+    segments = ['{id}' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/')]
+    return f'{method.upper()} {"/".join(segments)}'
+
+
+def nearest_rank(ordered, q):
+    """ The q-th quantile of an already sorted sequence, None if it is empty """
+    if not ordered:
+        return None
+    rank = min(len(ordered), max(1, math.ceil(q * len(ordered))))
+    return ordered[rank - 1]
+
+
+class Histogram:
+
+    def __init__(self):
+        self.samples = array('d')
+        self.sum = 0.0
+
+    @property
+    def count(self):
+        return len(self.samples)
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.sum += value
+
+    def percentile(self, q):
+        return nearest_rank(sorted(self.samples), q)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        quantiles = {str(q): nearest_rank(ordered, q) for q in QUANTILES}
+        return {'count': self.count, 'sum': self.sum, 'quantiles': quantiles}
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = {}
+        self.errors = 0
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    def to_dict(self):
+        return {
+            'latency_seconds': self.latency.summary(),
+            'statuses': dict(self.statuses),
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in
+        }
+
+
+class Metrics:
+    """
+    Timing data for a harness run: per-endpoint HTTP statistics, the duration of each stage of a submission and the
+    time envelopes spent in each submissionState.
+    """
+
+    def __init__(self, labels: dict = None):
+        self.labels = dict(labels or {})
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self.stages = {}
+            self.state_seconds = {}
+            self._envelope_states = {}
+
+    def record_request(self, endpoint, seconds, status=None, error=False, retries=0, bytes_out=0, bytes_in=0):
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.latency.observe(seconds)
+            if status is not None:
+                stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+            if error or (status is not None and status >= 400):
+                stats.errors += 1
+            stats.retries += retries
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+
+    def record_stage(self, name, seconds):
+        with self._lock:
+            self.stages.setdefault(name, Histogram()).observe(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def observe_envelope_state(self, envelope, state, at=None):
+        """ Attribute the time since the previous observation of this envelope to the state it was in then """
+        at = time.time() if at is None else at
+        with self._lock:
+            previous = self._envelope_states.get(envelope)
+            if previous:
+                previous_state, previous_at = previous
+                self.state_seconds[previous_state] = self.state_seconds.get(previous_state, 0.0) + at - previous_at
+            self._envelope_states[envelope] = (state, at)
+
+    def to_json(self):
+        with self._lock:
+            return {
+                'labels': dict(self.labels),
+                'endpoints': {endpoint: stats.to_dict() for endpoint, stats in sorted(self.endpoints.items())},
+                'stages': {name: histogram.summary() for name, histogram in sorted(self.stages.items())},
+                'envelope_state_seconds': dict(sorted(self.state_seconds.items()))
+            }
+
+    def to_prometheus(self):
+        data = self.to_json()
+        lines = []
+
+        def series(name, value, **labels):
+            if value is None:
+                return
+            all_labels = dict(self.labels, **labels)
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in sorted(all_labels.items()))
+            lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        lines.append('# TYPE ingest_http_request_duration_seconds summary')
+        for endpoint, stats in data['endpoints'].items():
+            latency = stats['latency_seconds']
+            for q, value in latency['quantiles'].items():
+                series('ingest_http_request_duration_seconds', value, endpoint=endpoint, quantile=q)
+            series('ingest_http_request_duration_seconds_sum', latency['sum'], endpoint=endpoint)
+            series('ingest_http_request_duration_seconds_count', latency['count'], endpoint=endpoint)
+        for name, key in (('ingest_http_errors_total', 'errors'), ('ingest_http_retries_total', 'retries'),
+                          ('ingest_http_request_bytes_total', 'bytes_out'),
+                          ('ingest_http_response_bytes_total', 'bytes_in')):
+            lines.append(f'# TYPE {name} counter')
+            for endpoint, stats in data['endpoints'].items():
+                series(name, stats[key], endpoint=endpoint)
+        lines.append('# TYPE ingest_http_responses_total counter')
+        for endpoint, stats in data['endpoints'].items():
+            for status, count in sorted(stats['statuses'].items()):
+                series('ingest_http_responses_total', count, endpoint=endpoint, status=status)
+
+        lines.append('# TYPE ingest_stage_duration_seconds summary')
+        for stage, summary in data['stages'].items():
+            for q, value in summary['quantiles'].items():
+                series('ingest_stage_duration_seconds', value, stage=stage, quantile=q)
+            series('ingest_stage_duration_seconds_sum', summary['sum'], stage=stage)
+            series('ingest_stage_duration_seconds_count', summary['count'], stage=stage)
+
+        lines.append('# TYPE ingest_envelope_state_seconds gauge')
+        for state, seconds in data['envelope_state_seconds'].items():
+            series('ingest_envelope_state_seconds', seconds, state=state)
+        return '\n'.join(lines) + '\n'
+
+    def export(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'metrics.json'), 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+        with open(os.path.join(directory, 'metrics.prom'), 'w') as f:
+            f.write(self.to_prometheus())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Metrics()
+_current = ContextLocal('metrics', default=registry)
+
+
+def current() -> Metrics:
+    """ The Metrics collecting for the current thread or task, the module-wide registry unless one was activated """
+    return _current.get()
+
+
+@contextmanager
+def activate(metrics: Metrics):
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def timed_stage(func):
+    """ Record how long each call to the decorated method takes as a stage named after it """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with current().stage(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
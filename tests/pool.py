@@ -0,0 +1,221 @@
+import argparse
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from tests import config, deployments, progress
+from tests.fixtures.dataset_fixture import DatasetFixture
+from tests.runners.dataset_runner import DatasetRunner
+
+DATASET = 'SS2'
+
+# the directory python -m tests.pool runs from, so that a refill started by a test finds the tests package
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PoolEntry:
+
+    def __init__(self, envelope_url, envelope_uuid=None, dataset=DATASET, created_at=None):
+        self.envelope_url = envelope_url
+        self.envelope_uuid = envelope_uuid
+        self.dataset = dataset
+        self.created_at = created_at if created_at is not None else time.time()
+
+    def age(self, now=None):
+        return (now or time.time()) - self.created_at
+
+    def to_dict(self):
+        return {'envelope_url': self.envelope_url, 'envelope_uuid': self.envelope_uuid, 'dataset': self.dataset,
+                'created_at': self.created_at}
+
+    @staticmethod
+    def from_dict(source: dict):
+        return PoolEntry(source['envelope_url'], envelope_uuid=source.get('envelope_uuid'),
+                         dataset=source.get('dataset', DATASET), created_at=source.get('created_at'))
+
+
+class SubmissionPool:
+    """
+    Completed primary SS2 submissions made ahead of time for a deployment, for scenarios that only need one as a
+    precondition. Each submission is handed out once. The pool is a JSON file locked with flock, so several test
+    processes can share it; entries older than max_age seconds are dropped rather than handed out, as is any
+    submission that is no longer Complete. Taking one starts a detached python -m tests.pool fill once the pool is
+    below size; a second lock lets only one process fill the pool at a time.
+    """
+
+    def __init__(self, deployment, directory=None, size=None, max_age=None):
+        self.deployment = deployments.resolve(deployment)
+        self.directory = directory or config.pool_dir
+        self.size = size if size is not None else config.pool_size
+        self.max_age = max_age if max_age is not None else config.pool_max_age
+        self.path = os.path.join(self.directory, f'pool-{self.deployment.name}.json')
+        self._lock_path = os.path.join(self.directory, f'pool-{self.deployment.name}.lock')
+        self._refill_lock_path = os.path.join(self.directory, f'pool-{self.deployment.name}.refill.lock')
+
+    @staticmethod
+    def configured(deployment):
+        """ The pool for deployment if INGEST_POOL_DIR is set, otherwise None """
+        return SubmissionPool(deployment) if config.pool_dir else None
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._lock_path, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _filling(self, wait=True):
+        """
+        Hold the lock for filling the pool while yielding True. Unless wait is set, yield False straight away if another
+        process holds it.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._refill_lock_path, 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            return [PoolEntry.from_dict(entry) for entry in json.load(f)]
+
+    def _write(self, entries):
+        partial = f'{self.path}.partial'
+        with open(partial, 'w') as f:
+            json.dump([entry.to_dict() for entry in entries], f, indent=2)
+        os.replace(partial, self.path)
+
+    def entries(self):
+        with self._locked():
+            return self._read()
+
+    def expire(self):
+        """ Drop entries older than max_age; returns how many were dropped """
+        with self._locked():
+            entries = self._read()
+            fresh = [entry for entry in entries if entry.age() <= self.max_age]
+            self._write(fresh)
+        return len(entries) - len(fresh)
+
+    def add(self, entry: PoolEntry):
+        with self._locked():
+            self._write(self._read() + [entry])
+
+    def acquire(self, ingest_api, refill=None):
+        """
+        Take the oldest fresh submission out of the pool and return its envelope, loaded with the caller's ingest_api
+        agent, once it is confirmed to be Complete, or None if the pool has none. Unless refill is False, or
+        INGEST_POOL_REFILL is off, a pool left below size is then topped up again by refill_in_background.
+        """
+        envelope = None
+        while envelope is None:
+            with self._locked():
+                entries = [entry for entry in self._read() if entry.age() <= self.max_age]
+                entry = entries.pop(0) if entries else None
+                self._write(entries)
+            if entry is None:
+                break
+            envelope = self._validate(ingest_api, entry)
+        if (config.pool_refill if refill is None else refill) and len(entries) < self.size:
+            self.refill_in_background()
+        return envelope
+
+    @staticmethod
+    def _validate(ingest_api, entry: PoolEntry):
+        try:
+            envelope = ingest_api.envelope(url=entry.envelope_url)
+            if envelope.status() == 'Complete':
+                return envelope
+            progress.report(f'discarding pooled submission {entry.envelope_url} in state {envelope.status()}',
+                            level=progress.WARNING)
+        except Exception as e:
+            progress.report(f'discarding pooled submission {entry.envelope_url}: {e!r}', level=progress.WARNING)
+        return None
+
+    def build(self) -> PoolEntry:
+        """ Make a new completed submission and add it to the pool """
+        runner = DatasetRunner(self.deployment)
+        try:
+            runner.complete_run(DatasetFixture(DATASET, self.deployment.name))
+            entry = PoolEntry(runner.submission_envelope.url, envelope_uuid=runner.submission_envelope.uuid)
+        finally:
+            runner.close()
+        self.add(entry)
+        return entry
+
+    def fill(self, size=None, wait=True):
+        """
+        Build submissions until the pool holds size fresh ones, after any other process filling the pool has finished.
+        Unless wait is set, nothing is built if another process is filling the pool.
+        """
+        size = size if size is not None else self.size
+        built = []
+        with self._filling(wait=wait) as filling:
+            if not filling:
+                return built
+            self.expire()
+            while len(self.entries()) < size:
+                built.append(self.build())
+        return built
+
+    def refill_in_background(self):
+        """
+        Start python -m tests.pool fill for this pool in a session of its own, so that it carries on after the tests
+        exit, and return the process, or None if another process is already filling the pool. Its output goes to
+        pool-<deployment>.refill.log, and its hca CLI configuration, including the selected upload area, is kept apart
+        from the tests'.
+        """
+        with self._filling(wait=False) as filling:
+            if not filling:
+                return None
+        name, directory = self.deployment.name, os.path.abspath(self.directory)
+        command = [sys.executable, '-m', 'tests.pool', 'fill', self.deployment.spec(), '--dir', directory,
+                   '--size', str(self.size), '--no-wait']
+        environment = dict(os.environ, XDG_CONFIG_HOME=os.path.join(directory, f'hca-refill-{name}'))
+        with open(os.path.join(directory, f'pool-{name}.refill.log'), 'a') as log:
+            return subprocess.Popen(command, cwd=PROJECT_DIR, env=environment, stdin=subprocess.DEVNULL, stdout=log,
+                                    stderr=subprocess.STDOUT, start_new_session=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the pool of completed primary submissions for a deployment.')
+    parser.add_argument('command', choices=('fill', 'list', 'expire'))
+    parser.add_argument('deployment', help='a deployment name or name=URL, see tests.fan_out')
+    parser.add_argument('--size', type=int, default=None, help='submissions to fill the pool to, INGEST_POOL_SIZE')
+    parser.add_argument('--dir', default=config.pool_dir, help='pool directory, INGEST_POOL_DIR by default')
+    parser.add_argument('--no-wait', dest='wait', action='store_false',
+                        help='fill nothing if another process is already filling the pool')
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error('no pool directory, pass --dir or set INGEST_POOL_DIR')
+
+    pool = SubmissionPool(deployments.Deployment.parse(args.deployment), directory=args.dir, size=args.size)
+    if args.command == 'fill':
+        for entry in pool.fill(size=args.size, wait=args.wait):
+            print(f'built {entry.envelope_url}')
+    elif args.command == 'expire':
+        print(f'expired {pool.expire()} submissions')
+    now = time.time()
+    for entry in pool.entries():
+        print(f'{entry.envelope_url}  {entry.dataset}  {entry.age(now) / 3600:.1f}h old')
+    progress.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from tests import config
+
+IGNORED_THREAD_PREFIXES = ('profiler', 'progress-')
+
+# the innermost Python frames of a thread blocked in C: on the network, in a sleep, on a lock or on a subprocess
+BLOCKING_FRAMES = {
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'), ('queue.py', 'get'),
+    ('socket.py', 'readinto'), ('socket.py', 'create_connection'), ('socket.py', 'getaddrinfo'),
+    ('socket.py', 'accept'), ('connection.py', 'create_connection'),
+    ('ssl.py', 'read'), ('ssl.py', 'recv_into'), ('ssl.py', 'sendall'), ('ssl.py', 'do_handshake'),
+    ('selectors.py', 'select'), ('subprocess.py', 'wait'), ('subprocess.py', '_try_wait'),
+    ('subprocess.py', '_communicate'), ('deadline.py', 'sleep'),
+}
+
+
+class SamplingProfiler:
+    """
+    Periodically samples the Python stack of every thread. Each sample is also classed as on-CPU or off-CPU by whether
+    the thread's CPU clock advanced for at least half of the time since its previous sample, which separates work done
+    in the harness (JSON parsing, openpyxl, deepcopy) from time spent waiting on the network, sleeps and subprocesses.
+    Per-thread CPU clocks need Python 3.7; before that a sample is off-CPU if its innermost frame is one of
+    BLOCKING_FRAMES, which misses blocking calls made from elsewhere. Stacks are written in the collapsed format
+    understood by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.wall_stacks = {}
+        self.cpu_stacks = {}
+        self.off_cpu_stacks = {}
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._labels = {}
+        self._clocks = {}
+        self._blocking_codes = {}
+        self.cpu_split = 'cpu clock' if hasattr(time, 'pthread_getcpuclockid') else 'leaf frame'
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._sample_until_stopped, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+        self.stopped_at = time.time()
+        return self
+
+    def _sample_until_stopped(self):
+        while not self._stopping.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        now = time.monotonic()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            name = names.get(thread_id, str(thread_id))
+            if name.startswith(IGNORED_THREAD_PREFIXES):
+                continue
+            stack = self._collapse(name, frame)
+            self.wall_stacks[stack] = self.wall_stacks.get(stack, 0) + 1
+            on_cpu = self._was_on_cpu(thread_id, now) if self.cpu_split == 'cpu clock' else not self._is_blocked(frame)
+            if on_cpu is not None:
+                target = self.cpu_stacks if on_cpu else self.off_cpu_stacks
+                target[stack] = target.get(stack, 0) + 1
+        self.samples += 1
+
+    def _collapse(self, thread_name, frame):
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+                self._labels[code] = label
+            labels.append(label)
+            frame = frame.f_back
+        labels.append(thread_name)
+        return ';'.join(reversed(labels))
+
+    def _is_blocked(self, frame):
+        code = frame.f_code
+        blocked = self._blocking_codes.get(code)
+        if blocked is None:
+            blocked = (os.path.basename(code.co_filename), code.co_name) in BLOCKING_FRAMES
+            self._blocking_codes[code] = blocked
+        return blocked
+
+    def _was_on_cpu(self, thread_id, now):
+        """ None where the thread's CPU clock cannot be read """
+        try:
+            cpu = time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+        except (AttributeError, OSError):
+            return None
+        previous = self._clocks.get(thread_id)
+        self._clocks[thread_id] = (now, cpu)
+        if previous is None:
+            return False
+        wall_delta, cpu_delta = now - previous[0], cpu - previous[1]
+        return wall_delta > 0 and cpu_delta >= wall_delta / 2
+
+    def summary(self):
+        """ Seconds spent in each function, in total and in the function itself, split into on- and off-CPU """
+        functions = {}
+
+        def entry(function):
+            return functions.setdefault(function, {'total': 0, 'self': 0, 'self_on_cpu': 0, 'self_off_cpu': 0})
+
+        for stack, count in self.wall_stacks.items():
+            frames = stack.split(';')[1:]
+            for function in set(frames):
+                entry(function)['total'] += count
+            if frames:
+                entry(frames[-1])['self'] += count
+        for stacks, key in ((self.cpu_stacks, 'self_on_cpu'), (self.off_cpu_stacks, 'self_off_cpu')):
+            for stack, count in stacks.items():
+                frames = stack.split(';')[1:]
+                if frames:
+                    entry(frames[-1])[key] += count
+        return {function: {key: samples * self.interval for key, samples in counts.items()}
+                for function, counts in sorted(functions.items(), key=lambda item: -item[1]['total'])}
+
+    def write(self, directory, name='profile'):
+        os.makedirs(directory, exist_ok=True)
+        for suffix, stacks in (('wall', self.wall_stacks), ('cpu', self.cpu_stacks), ('offcpu', self.off_cpu_stacks)):
+            with open(os.path.join(directory, f'{name}.{suffix}.folded'), 'w') as f:
+                for stack, count in sorted(stacks.items()):
+                    f.write(f'{stack} {count}\n')
+
+        summary = self.summary()
+        with open(os.path.join(directory, f'{name}.summary.json'), 'w') as f:
+            json.dump({'interval': self.interval, 'samples': self.samples, 'cpu_split': self.cpu_split,
+                       'duration': (self.stopped_at or time.time()) - self.started_at, 'functions': summary}, f,
+                      indent=2)
+        with open(os.path.join(directory, f'{name}.summary.txt'), 'w') as f:
+            f.write(f'on-CPU and off-CPU time split by {self.cpu_split}\n')
+            f.write(f'{"total (s)":>10} {"self (s)":>10} {"on-CPU (s)":>10} {"off-CPU (s)":>11}  function\n')
+            for function, seconds in summary.items():
+                f.write(f'{seconds["total"]:>10.2f} {seconds["self"]:>10.2f} {seconds["self_on_cpu"]:>10.2f} '
+                        f'{seconds["self_off_cpu"]:>11.2f}  {function}\n')
+
+
+@contextmanager
+def profile(name, directory=None, interval=None):
+    """
+    Profile the enclosed block and write the results to directory, INGEST_PROFILE_DIR by default. Does nothing at all
+    if no directory is configured.
+    """
+    directory = directory or config.profile_dir
+    if not directory:
+        yield None
+        return
+    profiler = SamplingProfiler(interval=interval or config.profile_interval).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write(directory, name=name)
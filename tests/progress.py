@@ -0,0 +1,240 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from logging import DEBUG, INFO, WARNING, ERROR
+
+from tests import config
+from tests.context import ContextLocal
+
+
+class Event:
+    __slots__ = ('time', 'level', 'run', 'elapsed', 'message', 'fields')
+
+    def __init__(self, time, level, run, elapsed, message, fields):
+        self.time = time
+        self.level = level
+        self.run = run
+        self.elapsed = elapsed
+        self.message = message
+        self.fields = fields
+
+    def to_dict(self):
+        return dict(self.fields, time=self.time, level=logging.getLevelName(self.level), run=self.run,
+                    elapsed=self.elapsed, message=self.message)
+
+
+class Sink:
+
+    def __init__(self, level=DEBUG):
+        self.level = level
+
+    def handle(self, event):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class ConsoleSink(Sink):
+    """
+    Writes events as "h:mm:ss [run] message" lines. Below WARNING, at most max_lines_per_second lines are written on
+    average; the rest are counted and the count reported with the next line that gets through.
+    """
+
+    def __init__(self, stream=None, level=INFO, max_lines_per_second=10.0, burst=50):
+        super().__init__(level)
+        self.stream = stream or sys.stdout
+        self.max_lines_per_second = max_lines_per_second
+        self.burst = burst
+        self.suppressed = 0
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+
+    def handle(self, event):
+        if event.level < WARNING and not self._take_token():
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            self.stream.write(f'{duration_h_mm_ss(event.elapsed)} ({self.suppressed} progress messages suppressed)\n')
+            self.suppressed = 0
+        run = f'[{event.run}] ' if event.run else ''
+        self.stream.write(f'{duration_h_mm_ss(event.elapsed)} {run}{event.message}\n')
+
+    def flush(self):
+        self.stream.flush()
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.max_lines_per_second)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class JsonLinesSink(Sink):
+
+    def __init__(self, path, level=DEBUG):
+        super().__init__(level)
+        self.path = path
+        self._file = open(path, 'a', buffering=64 * 1024)
+
+    def handle(self, event):
+        self._file.write(json.dumps(event.to_dict()) + '\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class AsyncSink(Sink):
+    """
+    Hands events to another sink on a background thread so that reporting never waits on I/O. The wrapped sink is
+    flushed whenever the queue runs dry rather than after every event. Events are dropped, and counted, if the queue
+    is full.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink: Sink, max_queued=10000):
+        super().__init__(sink.level)
+        self.sink = sink
+        self.dropped = 0
+        self._queue = queue.Queue(max_queued)
+        self._thread = threading.Thread(target=self._drain, name=f'progress-{type(sink).__name__}', daemon=True)
+        self._thread.start()
+
+    def handle(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self.sink.close()
+
+    def _drain(self):
+        while True:
+            event = self._queue.get()
+            try:
+                if event is self._STOP:
+                    return
+                self.sink.handle(event)
+                if self._queue.empty():
+                    self.sink.flush()
+            finally:
+                self._queue.task_done()
+
+
+class Run:
+    """
+    A context that progress is reported in, e.g. one scenario against one deployment. Each run measures elapsed time
+    from its own start and can send its events to its own sinks instead of the process-wide ones.
+    """
+
+    def __init__(self, name=None, sinks: list = None, **fields):
+        self.name = name
+        self.sinks = sinks
+        self.fields = fields
+        self.start_time = time.time()
+        self._token = None
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def emit(self, level, message, **fields):
+        now = time.time()
+        event = None
+        for sink in self._targets():
+            if level >= sink.level:
+                event = event or Event(now, level, self.name, now - self.start_time, message,
+                                       dict(self.fields, **fields))
+                sink.handle(event)
+
+    def debug(self, message, **fields):
+        self.emit(DEBUG, message, **fields)
+
+    def info(self, message, **fields):
+        self.emit(INFO, message, **fields)
+
+    def warning(self, message, **fields):
+        self.emit(WARNING, message, **fields)
+
+    def error(self, message, **fields):
+        self.emit(ERROR, message, **fields)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current.reset(self._token)
+        for sink in self._targets():
+            sink.flush()
+
+    def _targets(self):
+        return _sinks if self.sinks is None else self.sinks
+
+
+def duration_h_mm_ss(duration_secs):
+    m, s = divmod(int(duration_secs), 60)
+    h, m = divmod(m, 60)
+    return "%d:%02d:%02d" % (h, m, s)
+
+
+def configure(console_level=INFO, log_path=None, log_level=DEBUG):
+    """ Replace the process-wide sinks with an asynchronous console sink and, optionally, a JSON Lines file """
+    global _sinks
+    shutdown()
+    sinks = [AsyncSink(ConsoleSink(level=console_level))]
+    if log_path:
+        sinks.append(AsyncSink(JsonLinesSink(log_path, level=log_level)))
+    _sinks = sinks
+
+
+def level_named(name):
+    """ The logging level called name, e.g. 'debug' or 'WARNING' """
+    level = logging.getLevelName(name.upper())
+    if not isinstance(level, int):  # getLevelName answers 'Level <name>' for names it does not know
+        raise ValueError(f"Unknown progress level {name!r}, expected one of DEBUG, INFO, WARNING or ERROR")
+    return level
+
+
+def flush():
+    for sink in _sinks:
+        sink.flush()
+
+
+def shutdown():
+    for sink in _sinks:
+        sink.close()
+
+
+def current() -> Run:
+    return _current.get()
+
+
+def report(message, level=INFO, **fields):
+    current().emit(level, message, **fields)
+
+
+_sinks = []
+_current = ContextLocal('progress', default=Run())
+
+configure(console_level=level_named(config.progress_level), log_path=config.progress_log)
+atexit.register(shutdown)
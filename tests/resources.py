@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# the resources sampled, in the order they are reported
+RESOURCES = ('open_files', 'sockets', 'threads', 'traced_memory', 'temp_files')
+
+_FD_DIRECTORY = '/proc/self/fd'
+
+
+class ResourceSample:
+    __slots__ = ('at', 'iteration') + RESOURCES
+
+    def __init__(self, at, iteration, **values):
+        self.at = at
+        self.iteration = iteration
+        for name in RESOURCES:
+            setattr(self, name, values.get(name))
+
+    def to_dict(self):
+        return dict({'at': self.at, 'iteration': self.iteration}, **{name: getattr(self, name) for name in RESOURCES})
+
+
+class Growth:
+    """ A resource that grew steadily across the samples: first and last values and the share of steps that grew """
+
+    def __init__(self, resource, first, last, rising_share):
+        self.resource = resource
+        self.first = first
+        self.last = last
+        self.rising_share = rising_share
+
+    def __str__(self):
+        return f'{self.resource} grew from {self.first} to {self.last}, ' \
+               f'never falling in {self.rising_share:.0%} of samples'
+
+
+class ResourceTracker:
+    """
+    Samples what the process holds open over a long run: file descriptors, sockets, threads, memory allocated by
+    Python (via tracemalloc) and files in the temp directory. A resource whose samples keep rising, rather than
+    levelling off once caches and pools have warmed up, is reported as growing, which is how leaks show up.
+    """
+
+    def __init__(self, trace_memory=True, warm_up=2, frames=5):
+        self.samples = []
+        self.warm_up = warm_up
+        self.trace_memory = trace_memory
+        self._started_tracing = False
+        self._first_snapshot = None
+        self._last_snapshot = None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._started_tracing = True
+
+    def sample(self, iteration=None) -> ResourceSample:
+        fds = _open_fds()
+        traced_memory = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            traced_memory = tracemalloc.get_traced_memory()[0]
+            snapshot = tracemalloc.take_snapshot()
+            if len(self.samples) == self.warm_up:
+                self._first_snapshot = snapshot
+            self._last_snapshot = snapshot
+        sample = ResourceSample(time.time(), iteration if iteration is not None else len(self.samples),
+                                open_files=len(fds) if fds is not None else None,
+                                sockets=sum(1 for target in fds.values() if target.startswith('socket:'))
+                                if fds is not None else None,
+                                threads=threading.active_count(),
+                                traced_memory=traced_memory,
+                                temp_files=len(os.listdir(tempfile.gettempdir())))
+        self.samples.append(sample)
+        return sample
+
+    def growth(self, rising_share=0.9, min_samples=5) -> list:
+        """ Resources that rose across the samples after warm-up and fell in fewer than 1 - rising_share of steps """
+        samples = self.samples[self.warm_up:]
+        if len(samples) < min_samples:
+            return []
+        found = []
+        for resource in RESOURCES:
+            values = [getattr(sample, resource) for sample in samples]
+            if None in values or values[-1] <= values[0]:
+                continue
+            steps = list(zip(values, values[1:]))
+            share = sum(1 for before, after in steps if after >= before) / len(steps)
+            if share >= rising_share:
+                found.append(Growth(resource, values[0], values[-1], share))
+        return found
+
+    def top_allocations(self, limit=10) -> list:
+        """ Where traced memory grew most between the first sample after warm-up and the latest """
+        if self._first_snapshot is None or self._last_snapshot is self._first_snapshot:
+            return []
+        return self._last_snapshot.compare_to(self._first_snapshot, 'lineno')[:limit]
+
+    def report(self):
+        lines = []
+        if self.samples:
+            first, last = self.samples[0], self.samples[-1]
+            lines.append(f'{len(self.samples)} samples over {last.at - first.at:.0f}s')
+            for resource in RESOURCES:
+                lines.append(f'  {resource}: {getattr(first, resource)} -> {getattr(last, resource)}')
+        growth = self.growth()
+        lines.extend(f'GROWING: {found}' for found in growth)
+        if any(found.resource == 'traced_memory' for found in growth):
+            lines.append('largest allocation growth:')
+            lines.extend(f'  {difference}' for difference in self.top_allocations())
+        return '\n'.join(lines)
+
+    def save(self, directory, name='resources'):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{name}.jsonl')
+        with open(path, 'w') as f:
+            for sample in self.samples:
+                f.write(json.dumps(sample.to_dict()) + '\n')
+        with open(os.path.join(directory, f'{name}.txt'), 'w') as f:
+            f.write(self.report() + '\n')
+        return path
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._first_snapshot = self._last_snapshot = None
+
+
+def _open_fds():
+    """ {fd: what it refers to} for the process's open file descriptors, None where /proc is not available """
+    try:
+        names = os.listdir(_FD_DIRECTORY)
+    except OSError:
+        return None
+    fds = {}
+    for name in names:
+        try:
+            fds[name] = os.readlink(os.path.join(_FD_DIRECTORY, name))
+        except OSError:  # closed since it was listed, e.g. the descriptor listdir itself used
+            pass
+    return fds
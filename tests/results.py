@@ -0,0 +1,229 @@
+import argparse
+import os
+import sqlite3
+import subprocess
+import time
+
+from tests import config
+from tests.metrics import nearest_rank
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    scenario TEXT NOT NULL,
+    deployment TEXT,
+    commit_sha TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_scenario ON runs (scenario, deployment, started_at);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (started_at);
+
+CREATE TABLE IF NOT EXISTS run_values (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS run_values_by_run ON run_values (run_id, metric);
+CREATE INDEX IF NOT EXISTS run_values_by_metric ON run_values (metric, run_id);
+"""
+
+
+class ResultStore:
+    """
+    Persists what each run measured in a local SQLite database so that trends and regressions can be queried across
+    runs. Every measurement is stored as a named value of its run:
+
+    * duration: seconds the whole run took
+    * stage:<stage>: total seconds spent in a stage
+    * request:<endpoint>:<count|errors|retries|bytes_out|bytes_in|p50|p95|p99>: request statistics per endpoint
+    * state:<state>: estimated seconds envelopes spent in a submission state, summed over the run's envelopes
+    * time-to:<state>: seconds from first polling an envelope to first seeing it in a state, for the slowest envelope
+    * entities:<type|total>: number of entities of a type, or of all types, submitted
+
+    Queries only consider passed runs unless asked for another outcome, so that failed or aborted runs, which stop
+    early or wait out their time budget, do not skew trends and baselines.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, scenario, deployment, started_at, finished_at, values: dict, outcome=None, commit_sha=None):
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO runs (scenario, deployment, commit_sha, started_at, finished_at, outcome) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (scenario, deployment, commit_sha or current_commit(), started_at, finished_at, outcome))
+            run_id = cursor.lastrowid
+            self.connection.executemany('INSERT INTO run_values (run_id, metric, value) VALUES (?, ?, ?)',
+                                        [(run_id, metric, value) for metric, value in values.items()
+                                         if value is not None])
+        return run_id
+
+    def record_run(self, harness_run, outcome=None):
+        values = run_values(harness_run)
+        values['duration'] = harness_run.finished_at - harness_run.started_at
+        return self.record(harness_run.scenario, harness_run.deployment, harness_run.started_at,
+                           harness_run.finished_at, values, outcome=outcome)
+
+    def scenarios(self):
+        return self.connection.execute(
+            "SELECT scenario, deployment, COUNT(*), SUM(outcome = 'passed'), MAX(started_at) FROM runs "
+            'GROUP BY scenario, deployment ORDER BY scenario, deployment').fetchall()
+
+    def series(self, scenario, deployment, metric, last=30, outcome='passed'):
+        """
+        (run id, started at, commit, value) of the metric for the last runs of a scenario with the given outcome, or
+        with any outcome if it is None, oldest first
+        """
+        rows = self.connection.execute(
+            'SELECT runs.id, runs.started_at, runs.commit_sha, run_values.value '
+            'FROM (SELECT id, started_at, commit_sha FROM runs WHERE scenario = ? AND deployment = ? '
+            '      AND (? IS NULL OR outcome = ?) ORDER BY started_at DESC LIMIT ?) AS runs '
+            'JOIN run_values ON run_values.run_id = runs.id AND run_values.metric = ? '
+            'ORDER BY runs.started_at', (scenario, deployment, outcome, outcome, last, metric)).fetchall()
+        return rows
+
+    def latest_values(self, scenario, deployment, outcome='passed'):
+        row = self.connection.execute(
+            'SELECT id FROM runs WHERE scenario = ? AND deployment = ? AND (? IS NULL OR outcome = ?) '
+            'ORDER BY started_at DESC LIMIT 1', (scenario, deployment, outcome, outcome)).fetchone()
+        if not row:
+            return None, {}
+        values = self.connection.execute('SELECT metric, value FROM run_values WHERE run_id = ?', row).fetchall()
+        return row[0], dict(values)
+
+    def regressions(self, scenario, deployment, last=30, threshold=1.25, minimum_runs=5):
+        """
+        Metrics where the latest passed run is worse than threshold times the median of the passed runs before it, as
+        (metric, latest value, baseline median, ratio). Only metrics where larger is worse are considered.
+        """
+        run_id, latest = self.latest_values(scenario, deployment)
+        found = []
+        for metric, value in sorted(latest.items()):
+            if metric.startswith('entities:') or metric.endswith((':count', ':bytes_out', ':bytes_in')):
+                continue
+            baseline = [row[3] for row in self.series(scenario, deployment, metric, last=last + 1) if row[0] != run_id]
+            if len(baseline) < minimum_runs:
+                continue
+            median = nearest_rank(sorted(baseline), 0.5)
+            if median > 0 and value > median * threshold:
+                found.append((metric, value, median, value / median))
+        return found
+
+
+def run_values(harness_run):
+    """ The named values a HarnessRun measured, see ResultStore """
+    values = {}
+    data = harness_run.metrics.to_json()
+    for stage, summary in data['stages'].items():
+        values[f'stage:{stage}'] = summary['sum']
+    for endpoint, stats in data['endpoints'].items():
+        for key in ('errors', 'retries', 'bytes_out', 'bytes_in'):
+            values[f'request:{endpoint}:{key}'] = stats[key]
+        values[f'request:{endpoint}:count'] = stats['latency_seconds']['count']
+        for q, name in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+            values[f'request:{endpoint}:{name}'] = stats['latency_seconds']['quantiles'][q]
+
+    for timeline in harness_run.timeline.timelines.values():
+        for duration in timeline.state_durations():
+            values[f'state:{duration.state}'] = values.get(f'state:{duration.state}', 0.0) + duration.estimate
+        runs = timeline.runs()
+        if runs:
+            first_seen, reached = runs[0][1], {}
+            for state, seen_at, _ in runs:
+                reached.setdefault(state, seen_at - first_seen)
+            for state, seconds in reached.items():
+                values[f'time-to:{state}'] = max(values.get(f'time-to:{state}', 0.0), seconds)
+        for key, count in timeline.metadata.items():
+            if key in ('entities', 'biomaterials', 'files', 'processes', 'protocols', 'projects'):
+                metric = 'entities:total' if key == 'entities' else f'entities:{key}'
+                values[metric] = values.get(metric, 0) + count
+    return values
+
+
+def current_commit():
+    commit = os.environ.get('CI_COMMIT_SHA')
+    if commit:
+        return commit
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(__file__)).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the results of past harness runs.')
+    parser.add_argument('--db', default=config.results_db, help='results database, INGEST_RESULTS_DB by default')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('scenarios', help='list the scenarios and deployments with recorded runs')
+
+    trend = commands.add_parser('trend', help='show a metric over the last runs of a scenario')
+    trend.add_argument('--scenario', required=True)
+    trend.add_argument('--deployment', required=True)
+    trend.add_argument('--metric', required=True, help='e.g. time-to:Valid, stage:wait_for_envelope_to_complete')
+    trend.add_argument('--last', type=int, default=30)
+    trend.add_argument('--all-outcomes', action='store_true', help='include runs that failed')
+
+    metrics = commands.add_parser('metrics', help='list the metrics recorded by the latest run of a scenario')
+    metrics.add_argument('--scenario', required=True)
+    metrics.add_argument('--deployment', required=True)
+    metrics.add_argument('--all-outcomes', action='store_true', help='include runs that failed')
+
+    regressions = commands.add_parser('regressions', help='metrics where the latest run is worse than the baseline')
+    regressions.add_argument('--scenario', required=True)
+    regressions.add_argument('--deployment', required=True)
+    regressions.add_argument('--last', type=int, default=30, help='number of previous runs forming the baseline')
+    regressions.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args()
+
+    if not args.db:
+        parser.error('no results database, pass --db or set INGEST_RESULTS_DB')
+    store = ResultStore(args.db)
+    try:
+        if args.command == 'scenarios':
+            for scenario, deployment, count, passed, latest in store.scenarios():
+                print(f'{scenario:<60} {deployment or "":<12} {count:>6} runs, {passed:>6} passed, '
+                      f'latest {_format_time(latest)}')
+        elif args.command == 'trend':
+            rows = store.series(args.scenario, args.deployment, args.metric, last=args.last,
+                                outcome=None if args.all_outcomes else 'passed')
+            for run_id, started_at, commit_sha, value in rows:
+                print(f'{_format_time(started_at)}  {(commit_sha or "")[:8]:<8}  {value:>12.2f}')
+            values = sorted(row[3] for row in rows)
+            if values:
+                print(f'{args.metric} over {len(values)} runs: p50 {nearest_rank(values, 0.5):.2f}, '
+                      f'p95 {nearest_rank(values, 0.95):.2f}, min {values[0]:.2f}, max {values[-1]:.2f}')
+        elif args.command == 'metrics':
+            _, values = store.latest_values(args.scenario, args.deployment,
+                                            outcome=None if args.all_outcomes else 'passed')
+            for metric, value in sorted(values.items()):
+                print(f'{metric:<80} {value:>12.2f}')
+        elif args.command == 'regressions':
+            found = store.regressions(args.scenario, args.deployment, last=args.last, threshold=args.threshold)
+            for metric, value, median, ratio in found:
+                print(f'{metric:<80} {value:>10.2f} vs median {median:>10.2f} ({ratio:.2f}x)')
+            if not found:
+                print('no regressions')
+        else:
+            parser.print_help()
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
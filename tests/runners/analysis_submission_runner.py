@@ -1,16 +1,16 @@
 import json
 import os
-import time
 import uuid
 
 from ingest.api.ingestapi import IngestApi
-from ingest.api.requests_utils import create_session_with_retry
 from ingest.exporter.bundle import BundleManifest
 from ingest.utils.token_manager import TokenManager
 
+from tests import deadline, http_client
 from tests.fixtures.analysis_submission_fixture import \
     AnalysisSubmissionFixture
 from tests.ingest_agents import IngestUIAgent, IngestApiAgent
+from tests.metrics import timed_stage
 from tests.runners.submission_manager import SubmissionManager
 from tests.utils import Progress
 
@@ -36,22 +36,26 @@ class AnalysisSubmissionRunner:
         self.analysis_fixture = AnalysisSubmissionFixture()
         self.primary_submission_id = None
         self.primary_submission = None
-        self.session = create_session_with_retry()
+        self.session = http_client.session(retry_server_errors=True)
         self.submission_manager = None
 
     def run(self, dataset_fixture, analysis_fixture):
         self.create_primary_submission(dataset_fixture)
-        time.sleep(20)  # TODO had to add time delay to wait for spreadsheet upload which is async
+        deadline.sleep(20)  # TODO had to add time delay to wait for spreadsheet upload which is async
         self.bundle_manifest_uuid = self.mock_export()
         self.analysis_fixture = analysis_fixture
         self.create_analysis_submission()
         self.submission_manager.wait_for_envelope_to_be_validated()
 
+    def close(self):
+        self.session.close()
+
     def _get_headers(self):
         headers = {'Content-type': 'application/json',
                    'Authorization': f'Bearer {self.token_manager.get_token()}'}
         return headers
 
+    @timed_stage
     def create_primary_submission(self, dataset_fixture):
         spreadsheet_filename = os.path.basename(
             dataset_fixture.metadata_spreadsheet_path)
@@ -61,6 +65,7 @@ class AnalysisSubmissionRunner:
         Progress.report(f"PRIMARY submission ID is {self.primary_submission_id}\n")
         self.primary_submission = self.ingest_api.envelope(self.primary_submission_id)
 
+    @timed_stage
     def mock_export(self):
         submission_uuid = self.primary_submission.uuid
 
@@ -68,21 +73,22 @@ class AnalysisSubmissionRunner:
         bundle_manifest.bundleUuid = str(uuid.uuid4())
         bundle_manifest.envelopeUuid = submission_uuid
 
-        bundle_manifest.fileProjectMap = {project['uuid']['uuid']: [project['uuid']['uuid']] for project in
-                                          self.primary_submission.get_projects()}
-        bundle_manifest.fileBiomaterialMap = {biomaterial['uuid']['uuid']: [biomaterial['uuid']['uuid']] for biomaterial
-                                              in self.primary_submission.get_biomaterials()}
-        bundle_manifest.fileProcessMap = {process['uuid']['uuid']: [process['uuid']['uuid']] for process in
-                                          self.primary_submission.get_processes()}
-        bundle_manifest.fileProtocolMap = {protocol['uuid']['uuid']: [protocol['uuid']['uuid']] for protocol in
-                                           self.primary_submission.get_protocols()}
-        bundle_manifest.fileFilesMap = {file['uuid']['uuid']: [file['uuid']['uuid']] for file in
-                                        self.primary_submission.get_files()}
-        bundle_manifest.dataFiles = [file['dataFileUuid'] for file in self.primary_submission.get_files()]
+        bundle_manifest.fileProjectMap = {project.uuid: [project.uuid] for project in
+                                          self.primary_submission.views('projects')}
+        bundle_manifest.fileBiomaterialMap = {biomaterial.uuid: [biomaterial.uuid] for biomaterial
+                                              in self.primary_submission.views('biomaterials')}
+        bundle_manifest.fileProcessMap = {process.uuid: [process.uuid] for process in
+                                          self.primary_submission.views('processes')}
+        bundle_manifest.fileProtocolMap = {protocol.uuid: [protocol.uuid] for protocol in
+                                           self.primary_submission.views('protocols')}
+        files = list(self.primary_submission.views('files'))
+        bundle_manifest.fileFilesMap = {file.uuid: [file.uuid] for file in files}
+        bundle_manifest.dataFiles = [file.data_file_uuid for file in files]
 
         self.ingest_client_api.create_bundle_manifest(bundle_manifest)
         return bundle_manifest.bundleUuid
 
+    @timed_stage
     def create_analysis_submission(self):
         submission = self.ingest_client_api.create_submission()
         submission_url = submission["_links"]["self"]["href"].rsplit("{")[0]
@@ -92,7 +98,7 @@ class AnalysisSubmissionRunner:
                                                        'processes')
         protocol = self.ingest_client_api.create_entity(submission_url, self.analysis_fixture.analysis_protocol,
                                                         'protocols')
-        input_files = self.primary_submission.get_files()
+        input_file_uuids = [file.uuid for file in self.primary_submission.views('files')]
         self.analysis_process = process
         self.analysis_protocol = protocol
         self.ingest_client_api.link_entity(process, protocol, 'protocols')
@@ -105,7 +111,6 @@ class AnalysisSubmissionRunner:
         files = self.analysis_fixture.files
 
         add_input_file_url = process['_links']['inputFiles']['href']
-        input_file_uuids = [file['uuid']['uuid'] for file in input_files]
         for file_uuid in input_file_uuids:
             r = self.session.post(add_input_file_url, json.dumps({"inputFileUuid": file_uuid}),
                                   headers=self._get_headers())
@@ -1,6 +1,7 @@
 from ingest.api.ingestapi import IngestApi
 from ingest.utils.token_manager import TokenManager
 
+from tests import timeline
 from tests.ingest_agents import IngestApiAgent
 from tests.runners.submission_manager import SubmissionManager
 
@@ -33,6 +34,8 @@ class BigSubmissionRunner:
                                                  biomaterial,
                                                  'biomaterials')
 
+        timeline.current().annotate(self.submission_envelope.url, entities=METADATA_COUNT + 1,
+                                    biomaterials=METADATA_COUNT, files=1)
         self.submission_manager = SubmissionManager(self.submission_envelope)
         self.submission_manager.wait_for_envelope_to_be_in_draft()
         self.submission_manager.get_upload_area_credentials()
@@ -40,3 +43,6 @@ class BigSubmissionRunner:
         self.submission_manager.upload_files(f'{metadata_fixture.data_files_location}{filename}')
         self.submission_manager.forget_about_upload_area()
         self.submission_manager.wait_for_envelope_to_be_validated()
+
+    def close(self):
+        self.ingest_api.close()
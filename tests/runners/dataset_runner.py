@@ -1,6 +1,7 @@
 import os
 
-from tests.ingest_agents import IngestUIAgent, IngestApiAgent
+from tests import deployments
+from tests.metrics import timed_stage
 from tests.runners.submission_manager import SubmissionManager
 from tests.utils import Progress
 
@@ -8,10 +9,11 @@ from tests.utils import Progress
 class DatasetRunner:
 
     def __init__(self, deployment):
-        self.deployment = deployment
+        target = deployments.resolve(deployment)
+        self.deployment = target.name
 
-        self.ingest_broker = IngestUIAgent(deployment)
-        self.ingest_api = IngestApiAgent(deployment=deployment)
+        self.ingest_broker = target.ui_agent()
+        self.ingest_api = target.api_agent()
         self.submission_id = None
         self.submission_envelope = None
 
@@ -26,6 +28,7 @@ class DatasetRunner:
         self.submission_manager.get_upload_area_credentials()
         self.submission_manager.stage_data_files(self.dataset.config['data_files_location'])
         self.submission_manager.wait_for_envelope_to_be_validated()
+        self.submission_manager.record_submission_size()
         self.submission_manager.submission_envelope.disable_indexing()
         self.submission_manager.submit_envelope()
         self.submission_manager.wait_for_envelope_to_be_validated()
@@ -37,10 +40,16 @@ class DatasetRunner:
         self.submission_manager.get_upload_area_credentials()
         self.submission_manager.stage_data_files(self.dataset.config['data_files_location'])
         self.submission_manager.wait_for_envelope_to_be_validated()
+        self.submission_manager.record_submission_size()
         self.submission_manager.submission_envelope.disable_indexing()
         self.submission_manager.submit_envelope()
         self.submission_manager.wait_for_envelope_to_complete()
 
+    def close(self):
+        self.ingest_broker.close()
+        self.ingest_api.close()
+
+    @timed_stage
     def upload_spreadsheet_and_create_submission(self, dataset_fixture, project_uuid=None):
         spreadsheet_filename = os.path.basename(dataset_fixture.metadata_spreadsheet_path)
         Progress.report(f"CREATING SUBMISSION with {spreadsheet_filename}...")
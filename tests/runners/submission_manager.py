@@ -2,11 +2,11 @@ import subprocess
 from urllib.parse import urlparse
 from requests import HTTPError
 
+from tests import deadline, deployments, metrics, progress, timeline
+from tests.metrics import timed_stage
 from tests.utils import Progress
 from tests.wait_for import WaitFor
 
-import time
-
 MINUTE = 60
 
 
@@ -16,6 +16,7 @@ class SubmissionManager:
         self.submission_envelope = submission_envelope
         self.upload_credentials = None
 
+    @timed_stage
     def get_upload_area_credentials(self):
         Progress.report("WAITING FOR STAGING AREA...")
         self.upload_credentials = WaitFor(
@@ -26,6 +27,7 @@ class SubmissionManager:
     def _get_upload_area_credentials(self):
         return self.submission_envelope.reload().upload_credentials()
 
+    @timed_stage
     def stage_data_files(self, files):
         Progress.report("STAGING FILES...\n")
         self._stage_data_files_using_s3_sync(files)
@@ -36,55 +38,83 @@ class SubmissionManager:
         self.upload_files(files)
         self.forget_about_upload_area()
 
+    @timed_stage
     def select_upload_area(self):
         self._run_command(['hca', 'upload', 'select', self.upload_credentials])
 
+    @timed_stage
     def upload_files(self, files):
         self._run_command(['hca', 'upload', 'files', files])
 
+    @timed_stage
     def submit_envelope(self):
         self.submission_envelope.submit()
 
+    @timed_stage
     def forget_about_upload_area(self):
         self.upload_area_uuid = urlparse(self.upload_credentials).path.split('/')[1]
         self._run_command(['hca', 'upload', 'forget', self.upload_area_uuid])
 
+    @timed_stage
     def wait_for_envelope_to_be_validated(self):
         Progress.report("WAIT FOR VALIDATION...")
         WaitFor(self._envelope_is_in_state, 'Valid').to_return_value(
             value=True)
         Progress.report(" envelope is valid.\n")
 
+    @timed_stage
     def wait_for_envelope_to_be_submitted(self):
         Progress.report("WAIT FOR SUBMITTED...")
         WaitFor(self._envelope_is_in_state, 'Submitted').to_return_value(
             value=True)
         Progress.report(" envelope is submitted.\n")
 
+    @timed_stage
     def wait_for_envelope_to_be_in_draft(self):
         Progress.report("WAIT FOR VALIDATION...")
         WaitFor(self._envelope_is_in_state, 'Draft').to_return_value(
             value=True)
         Progress.report(" envelope is in Draft.\n")
 
+    @timed_stage
     def wait_for_envelope_to_complete(self):
         Progress.report("WAIT FOR COMPLETE...")
         WaitFor(self._envelope_is_in_state, 'Complete').to_return_value(
             value=True)
         Progress.report(" envelope is in Complete.\n")
 
+    def has_reached(self, state):
+        """
+        Whether the envelope is in state or has already moved past it, going by the order of
+        timeline.SUBMISSION_STATES. An envelope in a state outside that order, e.g. Invalid, has reached none of them.
+        """
+        envelope_status = self.submission_envelope.reload().status()
+        if envelope_status not in timeline.SUBMISSION_STATES or state not in timeline.SUBMISSION_STATES:
+            return envelope_status == state
+        return timeline.SUBMISSION_STATES.index(envelope_status) >= timeline.SUBMISSION_STATES.index(state)
+
     def _envelope_is_in_state(self, state):
         envelope_status = self.submission_envelope.reload().status()
-        Progress.report(f"envelope status is {envelope_status}")
+        timeline.current().observe(self.submission_envelope.url, envelope_status)
+        metrics.current().observe_envelope_state(self.submission_envelope.url, envelope_status)
+        Progress.report(f"envelope status is {envelope_status}", level=progress.DEBUG)
         return envelope_status in [state]
 
+    def record_submission_size(self):
+        """ Annotate the envelope's state timeline with how many of each kind of entity it contains """
+        envelope = self.submission_envelope
+        # only the UUIDs are kept from each entity, so counting does not build every HAL document
+        counts = {entity_type: sum(1 for _ in envelope.iter_entities(entity_type, fields=('uuid.uuid',)))
+                  for entity_type in ('biomaterials', 'files', 'processes', 'protocols', 'projects')}
+        timeline.current().annotate(envelope.url, entities=sum(counts.values()), **counts)
+
     def ensure_submitted(self):
         try:
             self.submit_envelope()
             if self._envelope_is_in_state('Submitted'):
                 return
             else:
-                time.sleep(1)
+                deadline.sleep(1)
                 return self.ensure_submitted()
         except HTTPError:
             if self._envelope_is_in_state('Submitted'):
@@ -94,7 +124,11 @@ class SubmissionManager:
 
     @staticmethod
     def _run_command(cmd_and_args_list, expected_retcode=0):
-        retcode = subprocess.call(cmd_and_args_list)
+        try:
+            retcode = subprocess.call(cmd_and_args_list, timeout=deadline.timeout(),
+                                      env=deployments.command_environment())
+        except subprocess.TimeoutExpired as e:
+            raise deadline.DeadlineExceeded(f"'{' '.join(cmd_and_args_list)}' did not finish within the deadline") from e
         if retcode != 0:
             raise Exception(
                 "Unexpected return code from '{command}', expected {expected_retcode} got {actual_retcode}".format(
@@ -1,40 +1,40 @@
 import os
+import tempfile
 
 import openpyxl
 from ingest.api.ingestapi import IngestApi
 
+from tests import config, snapshot
+from tests.checkpoint import Checkpoint
 from tests.fixtures.dataset_fixture import DatasetFixture
 from tests.ingest_agents import IngestApiAgent, IngestUIAgent
+from tests.metrics import timed_stage
+from tests.pool import SubmissionPool
 from tests.runners.submission_manager import SubmissionManager
 from tests.utils import Progress
 
 METADATA_COUNT = 10
 
-
-class BundleManifest:
-    def __init__(self, resource):
-        self._object = resource
-
-    @property
-    def fqid(self):
-        return f'{self.uuid}.{self.version}'
-
-    @property
-    def version(self):
-        return self._object.get('bundleVersion')
-
-    @property
-    def uuid(self):
-        return self._object.get('bundleUuid')
+# states an envelope recorded in a checkpoint cannot be resumed from
+FAILED_STATES = ('Invalid',)
 
 
 class UpdateSubmissionRunner:
+    """
+    Submits the SS2 dataset, or takes a completed one from the pool if INGEST_POOL_DIR is set, then an update to its
+    project, and compares the two submissions. Progress is checkpointed after every stage, so with
+    INGEST_CHECKPOINT_DIR set a rerun after a failure reattaches to the envelopes the failed run made and carries on
+    from the last stage it completed.
+    """
+
     def __init__(self, deployment, ingest_broker: IngestUIAgent, ingest_api: IngestApiAgent,
-                 ingest_client_api: IngestApi):
+                 ingest_client_api: IngestApi, checkpoint: Checkpoint = None, pool: SubmissionPool = None):
         self.deployment = deployment
         self.ingest_broker = ingest_broker
         self.ingest_api = ingest_api
         self.ingest_client_api = ingest_client_api
+        self.checkpoint = checkpoint or Checkpoint.for_scenario('update-submission', deployment)
+        self.pool = pool or SubmissionPool.configured(deployment)
 
         self.primary_submission = None
         self.update_submission = None
@@ -44,66 +44,143 @@ class UpdateSubmissionRunner:
         self.primary_bundle_fqids = None
         self.updated_bundle_fqids = None
 
+        self.project_uuid = None
+        self.primary_snapshot = None
+        self.update_snapshot = None
+        self.snapshot_diff = None
+
     def run(self):
+        checkpoint = self.checkpoint
+        if checkpoint.stage and self._check_checkpoint_envelopes():
+            Progress.report(f"RESUMING after stage {checkpoint.stage} from {checkpoint.path}")
+
         self.primary_submission = self.run_primary_submission('SS2')
-        primary_bundle_manifests = self.primary_submission.get_bundle_manifests()
-        self.primary_bundle_fqids = [BundleManifest(obj).fqid for obj in primary_bundle_manifests]
-        projects = self.primary_submission.get_projects()
+        if checkpoint.done('primary_recorded'):
+            self.primary_bundle_fqids = checkpoint['primary_bundle_fqids']
+            self.project_uuid = checkpoint['project_uuid']
+            self.primary_snapshot = snapshot.SubmissionSnapshot.from_dict(checkpoint['primary_snapshot'])
+        else:
+            self.primary_bundle_fqids = [manifest.fqid for manifest in
+                                         self.primary_submission.views('bundleManifests')]
+            self.project_uuid = self.primary_submission.retrieve_projects()[0].uuid
+            self.primary_snapshot = snapshot.SubmissionSnapshot.capture(self.primary_submission)
+            checkpoint.complete('primary_recorded', primary_bundle_fqids=self.primary_bundle_fqids,
+                                project_uuid=self.project_uuid, primary_snapshot=self.primary_snapshot.to_dict())
 
         self.update_submission = self.run_update_submission(self.primary_submission)
-        updated_bundle_manifests = self.update_submission.get_bundle_manifests()
-        self.updated_bundle_fqids = [BundleManifest(obj).fqid for obj in updated_bundle_manifests]
-
-        Progress.report(f"PROJECT UUID: {projects[0]['uuid']['uuid']}")
+        self.updated_bundle_fqids = [manifest.fqid for manifest in self.update_submission.views('bundleManifests')]
+        self.update_snapshot = snapshot.SubmissionSnapshot.capture(self.update_submission)
+        self.snapshot_diff = snapshot.diff(self.primary_snapshot, self.update_snapshot)
+        if config.snapshot_dir:
+            self.primary_snapshot.save(os.path.join(config.snapshot_dir, f'{self.primary_submission.uuid}.json'))
+            self.update_snapshot.save(os.path.join(config.snapshot_dir, f'{self.update_submission.uuid}.json'))
+
+        Progress.report(f"PROJECT UUID: {self.project_uuid}")
         Progress.report(f"PRIMARY BUNDLES: {' '.join(self.primary_bundle_fqids)}")
         Progress.report(f"UPDATE BUNDLES: {' '.join(self.updated_bundle_fqids)}")
+        Progress.report(f"UPDATE CHANGES: {self.snapshot_diff}")
 
+        checkpoint.delete()
         return self
 
+    def _check_checkpoint_envelopes(self):
+        """ Whether the envelopes the checkpoint names still exist and have not failed; if not, start from scratch """
+        for key in ('primary_url', 'update_url'):
+            url = self.checkpoint.get(key)
+            if not url:
+                continue
+            try:
+                state = self.ingest_api.envelope(url=url).data.get('submissionState')
+            except Exception as e:
+                self.checkpoint.discard(f'loading {url} failed: {e!r}')
+                return False
+            if state is None or state in FAILED_STATES:
+                self.checkpoint.discard(f'{url} is {state or "gone"}')
+                return False
+        return True
+
+    @timed_stage
     def run_update_submission(self, primary_submission: IngestApiAgent.SubmissionEnvelope):
-        update_spreadsheet_content = self.ingest_broker.download(primary_submission.uuid)
-        update_spreadsheet_filename = f'{primary_submission.uuid}.xlsx'
-        update_spreadsheet_path = os.path.abspath(os.path.join(os.path.dirname(__file__), update_spreadsheet_filename))
-        with open(update_spreadsheet_path, 'wb') as f:
-            f.write(update_spreadsheet_content)
-
-        update_spreadsheet = openpyxl.load_workbook(update_spreadsheet_path)
-        project_worksheet = update_spreadsheet['Project']
-        if project_worksheet['B4'].value != "project.project_core.project_short_name":
-            raise RuntimeError("Project shortname is no longer in cell project!B4")
-        project_worksheet['B6'] = f"UPDATED {project_worksheet['B6'].value}"
-        update_spreadsheet.save(update_spreadsheet_path)
-
-        update_submission_id = self.ingest_broker.upload(update_spreadsheet_path, is_update=True)
-        Progress.report(f"UPDATE submission ID is {update_submission_id}\n")
-        update_submission = self.ingest_api.envelope(envelope_id=update_submission_id)
-
+        checkpoint = self.checkpoint
+        if checkpoint.done('update_uploaded'):
+            update_submission = self.ingest_api.envelope(url=checkpoint['update_url'])
+        else:
+            update_submission = self._upload_update_spreadsheet(primary_submission)
+            checkpoint.complete('update_uploaded', update_url=update_submission.url)
+
+        # a resumed envelope may have moved on since it was checkpointed, so waits for states it has passed are skipped
         submission_manager = SubmissionManager(update_submission)
-        submission_manager.wait_for_envelope_to_be_validated()
-        submission_manager.submit_envelope()
-        submission_manager.wait_for_envelope_to_be_submitted()
+        if not checkpoint.done('update_submitted'):
+            if not submission_manager.has_reached('Submitted'):
+                submission_manager.wait_for_envelope_to_be_validated()
+                submission_manager.submit_envelope()
+            checkpoint.complete('update_submitted')
+        if not submission_manager.has_reached('Submitted'):
+            submission_manager.wait_for_envelope_to_be_submitted()
         submission_manager.wait_for_envelope_to_complete()
         # check old bundle and new bundle
         return update_submission
 
+    def _upload_update_spreadsheet(self, primary_submission: IngestApiAgent.SubmissionEnvelope):
+        update_spreadsheet_content = self.ingest_broker.download(primary_submission.uuid)
+        with tempfile.TemporaryDirectory(prefix='update-spreadsheet-') as directory:
+            update_spreadsheet_path = os.path.join(directory, f'{primary_submission.uuid}.xlsx')
+            with open(update_spreadsheet_path, 'wb') as f:
+                f.write(update_spreadsheet_content)
+
+            update_spreadsheet = openpyxl.load_workbook(update_spreadsheet_path)
+            project_worksheet = update_spreadsheet['Project']
+            if project_worksheet['B4'].value != "project.project_core.project_short_name":
+                raise RuntimeError("Project shortname is no longer in cell project!B4")
+            project_worksheet['B6'] = f"UPDATED {project_worksheet['B6'].value}"
+            update_spreadsheet.save(update_spreadsheet_path)
+
+            update_submission_id = self.ingest_broker.upload(update_spreadsheet_path, is_update=True)
+        Progress.report(f"UPDATE submission ID is {update_submission_id}\n")
+        return self.ingest_api.envelope(envelope_id=update_submission_id)
+
+    @timed_stage
     def run_primary_submission(self, dataset_name):
-        dataset_fixture = DatasetFixture(dataset_name, self.deployment)
-        spreadsheet_filename = os.path.basename(dataset_fixture.metadata_spreadsheet_path)
-        Progress.report(f"CREATING SUBMISSION with {spreadsheet_filename}...")
-        submission_id = self.ingest_broker.upload(dataset_fixture.metadata_spreadsheet_path)
-        Progress.report(
-            f"PRIMARY submission is in {self.ingest_api.ingest_api_url}/submissionEnvelopes/{submission_id}\n")
-        primary_submission = self.ingest_api.envelope(submission_id)
+        checkpoint = self.checkpoint
+        if not checkpoint.done('primary_uploaded') and self.pool:
+            pooled = self.pool.acquire(self.ingest_api)
+            if pooled:
+                Progress.report(f"PRIMARY submission taken from the pool: {pooled.url}")
+                for stage in ('primary_uploaded', 'primary_staged', 'primary_submitted'):
+                    checkpoint.complete(stage, primary_url=pooled.url)
+        if checkpoint.done('primary_uploaded'):
+            primary_submission = self.ingest_api.envelope(url=checkpoint['primary_url'])
+        else:
+            dataset_fixture = DatasetFixture(dataset_name, self.deployment)
+            spreadsheet_filename = os.path.basename(dataset_fixture.metadata_spreadsheet_path)
+            Progress.report(f"CREATING SUBMISSION with {spreadsheet_filename}...")
+            submission_id = self.ingest_broker.upload(dataset_fixture.metadata_spreadsheet_path)
+            Progress.report(
+                f"PRIMARY submission is in {self.ingest_api.ingest_api_url}/submissionEnvelopes/{submission_id}\n")
+            primary_submission = self.ingest_api.envelope(submission_id)
+            checkpoint.complete('primary_uploaded', primary_url=primary_submission.url)
 
         submission_manager = SubmissionManager(primary_submission)
-        submission_manager.get_upload_area_credentials()
-        submission_manager.stage_data_files(dataset_fixture.config['data_files_location'])
-        submission_manager.wait_for_envelope_to_be_validated()
-
-        # Disable indexing since this is an internal test for ingest, we don't need to trigger analysis pipelines
-        submission_manager.submission_envelope.disable_indexing()
-
-        submission_manager.submit_envelope()
+        if not checkpoint.done('primary_staged'):
+            dataset_fixture = DatasetFixture(dataset_name, self.deployment)
+            submission_manager.upload_credentials = checkpoint.get('primary_upload_credentials')
+            if not submission_manager.upload_credentials:
+                submission_manager.get_upload_area_credentials()
+                checkpoint.complete('primary_credentials',
+                                    primary_upload_credentials=submission_manager.upload_credentials)
+            submission_manager.stage_data_files(dataset_fixture.config['data_files_location'])
+            checkpoint.complete('primary_staged')
+
+        if not checkpoint.done('primary_submitted'):
+            if not submission_manager.has_reached('Submitted'):  # it may have been submitted before a failure
+                submission_manager.wait_for_envelope_to_be_validated()
+
+                # Disable indexing since this is an internal test for ingest, we don't need to trigger analysis
+                # pipelines
+                submission_manager.submission_envelope.disable_indexing()
+
+                submission_manager.submit_envelope()
+            checkpoint.complete('primary_submitted')
         submission_manager.wait_for_envelope_to_complete()
 
         return primary_submission
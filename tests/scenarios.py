@@ -0,0 +1,48 @@
+from tests.deployments import Deployment
+from tests.fixtures.dataset_fixture import DatasetFixture
+from tests.runners.dataset_runner import DatasetRunner
+from tests.runners.submission_manager import SubmissionManager
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """ Register a function taking a Deployment as a scenario that can be run against several deployments at once """
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+@scenario('smoke')
+def smoke(deployment: Deployment):
+    """ Create an empty envelope, wait for it to be valid, submit it and wait for it to complete; stand-ins can run it """
+    ingest_api = deployment.api_agent()
+    try:
+        submission_manager = SubmissionManager(ingest_api.create_envelope())
+        submission_manager.wait_for_envelope_to_be_validated()
+        submission_manager.record_submission_size()
+        submission_manager.submit_envelope()
+        submission_manager.wait_for_envelope_to_complete()
+    finally:
+        ingest_api.close()
+
+
+@scenario('ss2-upload')
+def ss2_upload(deployment: Deployment):
+    """ Submit the SS2 dataset and wait for it to be valid, as test_ss2_ingest_to_upload does """
+    runner = DatasetRunner(deployment)
+    try:
+        runner.valid_run(DatasetFixture('SS2', deployment.name))
+    finally:
+        runner.close()
+
+
+@scenario('ss2-complete')
+def ss2_complete(deployment: Deployment):
+    """ Submit the SS2 dataset and wait for it to complete, as test_ss2_ingest_to_dss does """
+    runner = DatasetRunner(deployment)
+    try:
+        runner.complete_run(DatasetFixture('SS2', deployment.name))
+    finally:
+        runner.close()
@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import json
+import os
+
+from tests import hal_stream
+
+ENTITY_TYPES = ('projects', 'biomaterials', 'processes', 'protocols', 'files')
+
+# relations captured as the links of each entity type; they are enough to rebuild the submission graph
+LINK_RELATIONS = {
+    'processes': ('inputBiomaterials', 'derivedBiomaterials', 'inputFiles', 'derivedFiles', 'protocols')
+}
+
+_FIELDS = ('uuid.uuid', 'content', 'dcpVersion', 'updateDate', '_links')
+
+
+def content_hash(content):
+    return hashlib.sha1(json.dumps(content, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class EntityRecord:
+    __slots__ = ('uuid', 'entity_type', 'version', 'content_hash', 'links')
+
+    def __init__(self, uuid, entity_type, version=None, content_hash=None, links: dict = None):
+        self.uuid = uuid
+        self.entity_type = entity_type
+        self.version = version
+        self.content_hash = content_hash
+        self.links = links or {}
+
+    @property
+    def links_hash(self):
+        return content_hash(self.links) if self.links else None
+
+    def to_dict(self):
+        return {'uuid': self.uuid, 'type': self.entity_type, 'version': self.version,
+                'content_hash': self.content_hash, 'links': self.links}
+
+    @staticmethod
+    def from_dict(source: dict):
+        return EntityRecord(source['uuid'], source['type'], version=source.get('version'),
+                            content_hash=source.get('content_hash'), links=source.get('links'))
+
+
+class SubmissionSnapshot:
+    """
+    The entity graph of a submission: every entity by UUID with its version, a hash of its content and the UUIDs it
+    links to. Each entity type also gets a digest of all its records so that types with no changes at all can be
+    skipped when two snapshots are compared.
+    """
+
+    def __init__(self, envelope_uuid=None, records: dict = None):
+        self.envelope_uuid = envelope_uuid
+        self.records = records or {}
+        self._digests = None
+
+    @staticmethod
+    def capture(envelope, include_links=True):
+        snapshot = SubmissionSnapshot(envelope_uuid=envelope.uuid)
+        for entity_type in ENTITY_TYPES:
+            for entity in envelope.iter_entities(entity_type, fields=_FIELDS):
+                links = {}
+                if include_links:
+                    available = entity.get('_links', {})
+                    for relation in LINK_RELATIONS.get(entity_type, ()):
+                        if relation in available:
+                            links[relation] = sorted(_linked_uuids(envelope, available[relation]['href'], relation))
+                snapshot.add(EntityRecord(entity['uuid']['uuid'], entity_type,
+                                          version=entity.get('dcpVersion') or entity.get('updateDate'),
+                                          content_hash=content_hash(entity.get('content')),
+                                          links=links))
+        return snapshot
+
+    def add(self, record: EntityRecord):
+        self.records[record.uuid] = record
+        self._digests = None
+
+    def of_type(self, entity_type):
+        return {uuid: record for uuid, record in self.records.items() if record.entity_type == entity_type}
+
+    def digests(self):
+        """ A digest per entity type over the UUIDs, versions, content hashes and links of all its entities """
+        if self._digests is None:
+            by_type = {}
+            for record in self.records.values():
+                by_type.setdefault(record.entity_type, []).append(f'{record.uuid}:{record.version}:'
+                                                                  f'{record.content_hash}:{record.links_hash}')
+            self._digests = {entity_type: hashlib.sha1('\n'.join(sorted(lines)).encode('utf-8')).hexdigest()
+                             for entity_type, lines in by_type.items()}
+        return self._digests
+
+    def to_dict(self):
+        return {'envelope_uuid': self.envelope_uuid, 'entities': [record.to_dict() for record in self.records.values()]}
+
+    @staticmethod
+    def from_dict(source: dict):
+        records = {record['uuid']: EntityRecord.from_dict(record) for record in source['entities']}
+        return SubmissionSnapshot(envelope_uuid=source.get('envelope_uuid'), records=records)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        return path
+
+    @staticmethod
+    def load(path):
+        with open(path) as f:
+            return SubmissionSnapshot.from_dict(json.load(f))
+
+
+def _linked_uuids(envelope, href, relation):
+    entity_type = 'protocols' if relation == 'protocols' else \
+        'files' if relation.endswith('Files') else 'biomaterials'
+    entities = hal_stream.stream_entities(envelope.session, href, entity_type, fields=('uuid.uuid',),
+                                          headers=envelope.auth_headers)
+    return (entity['uuid']['uuid'] for entity in entities)
+
+
+class SnapshotDiff:
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.changed = {}
+        self.unchanged_count = 0
+        self.skipped_types = []
+
+    def changed_uuids(self, aspect=None):
+        """ UUIDs of changed entities, optionally only those whose 'content', 'version' or 'links' changed """
+        return {uuid for uuid, aspects in self.changed.items() if aspect is None or aspect in aspects}
+
+    @property
+    def is_empty(self):
+        return not self.added and not self.removed and not self.changed
+
+    def __str__(self):
+        return f'{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed, ' \
+               f'{self.unchanged_count} unchanged' + \
+               (f' (skipped unchanged {", ".join(self.skipped_types)})' if self.skipped_types else '')
+
+
+def diff(before: SubmissionSnapshot, after: SubmissionSnapshot) -> SnapshotDiff:
+    """
+    Compare two snapshots entity by entity, keyed by UUID. Entity types whose digests match are skipped without
+    looking at their entities.
+    """
+    result = SnapshotDiff()
+    before_digests, after_digests = before.digests(), after.digests()
+    for entity_type in sorted(set(before_digests) | set(after_digests)):
+        before_records, after_records = before.of_type(entity_type), after.of_type(entity_type)
+        if before_digests.get(entity_type) == after_digests.get(entity_type):
+            result.skipped_types.append(entity_type)
+            result.unchanged_count += len(after_records)
+            continue
+        for uuid, record in after_records.items():
+            previous = before_records.get(uuid)
+            if previous is None:
+                result.added.append(uuid)
+                continue
+            aspects = [aspect for aspect, changed in (('content', previous.content_hash != record.content_hash),
+                                                       ('version', previous.version != record.version),
+                                                       ('links', previous.links != record.links)) if changed]
+            if aspects:
+                result.changed[uuid] = aspects
+            else:
+                result.unchanged_count += 1
+        result.removed.extend(uuid for uuid in before_records if uuid not in after_records)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff two saved submission snapshots.')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    changes = diff(SubmissionSnapshot.load(args.before), SubmissionSnapshot.load(args.after))
+    print(changes)
+    for uuid in changes.added:
+        print(f'+ {uuid}')
+    for uuid in changes.removed:
+        print(f'- {uuid}')
+    for uuid, aspects in sorted(changes.changed.items()):
+        print(f'~ {uuid} ({", ".join(aspects)})')
+
+
+if __name__ == '__main__':
+    main()
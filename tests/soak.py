@@ -0,0 +1,78 @@
+import argparse
+import sys
+import time
+from contextlib import ExitStack
+
+from tests import deployments, progress
+from tests.deployments import Deployment
+from tests.harness import HarnessRun
+from tests.resources import ResourceTracker
+from tests.scenarios import SCENARIOS
+from tests.stand_in import IngestStandIn
+
+
+def soak(scenario_name, deployment: Deployment, seconds=None, iterations=None, tracker: ResourceTracker = None):
+    """
+    Run a scenario over and over against one deployment, each run with its own HarnessRun, until seconds have passed
+    or iterations have been run, sampling the process's resources after every run. Returns the tracker and the
+    number of runs that failed.
+    """
+    func = SCENARIOS[scenario_name]
+    tracker = tracker or ResourceTracker()
+    stop_at = time.time() + seconds if seconds else None
+    failures = 0
+    iteration = 0
+    tracker.sample(iteration)
+    with deployments.activate(deployment):
+        while (iterations is None or iteration < iterations) and (stop_at is None or time.time() < stop_at):
+            iteration += 1
+            harness_run = HarnessRun(scenario_name, deployment.name).start()
+            try:
+                func(deployment)
+                outcome = 'passed'
+            except Exception as e:
+                failures += 1
+                outcome = 'failed'
+                progress.current().error(f'{scenario_name} run {iteration} failed: {e!r}')
+            finally:
+                harness_run.finish(outcome=outcome)
+            sample = tracker.sample(iteration)
+            progress.report(f'soak run {iteration} {outcome}: {sample.open_files} files, {sample.sockets} sockets, '
+                            f'{sample.threads} threads, {(sample.traced_memory or 0) / 1e6:.1f} MB traced, '
+                            f'{sample.temp_files} temp files')
+    return tracker, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a scenario repeatedly and track the resources the harness holds.')
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    parser.add_argument('deployment', nargs='?', help='a deployment name or name=URL, see tests.fan_out')
+    parser.add_argument('--stand-in', action='store_true', help='run against a local stand-in instead')
+    parser.add_argument('--hours', type=float, default=None)
+    parser.add_argument('--iterations', type=int, default=None)
+    parser.add_argument('--output', default=None, help='directory to write resources.jsonl and resources.txt to')
+    args = parser.parse_args()
+    if not args.hours and not args.iterations:
+        parser.error('give --hours, --iterations or both')
+
+    with ExitStack() as stack:
+        if args.stand_in:
+            stand_in = stack.enter_context(IngestStandIn(state_seconds=0.1))
+            deployment = Deployment('stand-in', api_url=stand_in.url, broker_url=stand_in.url, authenticated=False)
+        elif args.deployment:
+            deployment = Deployment.parse(args.deployment)
+        else:
+            parser.error('give a deployment or --stand-in')
+        tracker, failures = soak(args.scenario, deployment, seconds=args.hours * 3600 if args.hours else None,
+                                 iterations=args.iterations)
+        progress.flush()
+        print(tracker.report())
+        if args.output:
+            tracker.save(args.output)
+        growing = tracker.growth()
+        tracker.close()
+    sys.exit(1 if growing or failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+import json
+import re
+import sys
+import threading
+import time
+import uuid as uuidlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+from tests.fixtures.hal_fixture import HalFixture
+
+ENVELOPE_ID = f'{0:024x}'
+
+# states a stand-in envelope moves through, one every state_seconds, before and after it is submitted
+DRAFT_STATES = ('Draft', 'Validating', 'Valid')
+SUBMITTED_STATES = ('Submitted', 'Processing', 'Cleanup', 'Complete')
+
+ENTITY_TYPES = ('projects', 'biomaterials', 'processes', 'protocols', 'files', 'bundleManifests')
+
+
+class _Envelope:
+
+    def __init__(self, envelope_id):
+        self.envelope_id = envelope_id
+        self.uuid = str(uuidlib.uuid4())
+        self.created_at = time.time()
+        self.submitted_at = None
+
+    def state(self, state_seconds):
+        if self.submitted_at is None:
+            states, since = DRAFT_STATES, self.created_at
+        else:
+            states, since = SUBMITTED_STATES, self.submitted_at
+        steps = int((time.time() - since) / state_seconds) if state_seconds else len(states)
+        return states[min(steps, len(states) - 1)]
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # clients hanging up are not the stand-in's problem
+            super().handle_error(request, client_address)
+
+
+class IngestStandIn:
+    """
+    A local stand-in for the Ingest API that serves listings of synthetic entities, for exercising the harness at
+    production scale without a deployment. Each listing holds entity_counts[entity_type] entities, split into pages
+    of page_size if given, and is streamed to the client as it is generated rather than built in memory first.
+
+    Envelopes can also be created, polled and submitted; they move on to their next state every state_seconds. Every
+    response is delayed by latency seconds, so that several stand-ins can play deployments of differing speed. With
+    max_in_flight set, requests beyond that many at once are turned away with 429 and a Retry-After of retry_after.
+    """
+
+    def __init__(self, entity_counts: dict = None, page_size=None, host='127.0.0.1', port=0, state_seconds=0.5,
+                 latency=0.0, max_in_flight=None, retry_after=1):
+        self.entity_counts = dict(entity_counts or {})
+        self.page_size = page_size
+        self.state_seconds = state_seconds
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+        self.envelopes = {}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.stand_in = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def envelope_url(self, envelope_id=ENVELOPE_ID):
+        return f'{self.url}/submissionEnvelopes/{envelope_id}'
+
+    def create_envelope(self) -> _Envelope:
+        with self._lock:
+            envelope = _Envelope(f'{len(self.envelopes) + 1:024x}')
+            self.envelopes[envelope.envelope_id] = envelope
+        return envelope
+
+    def envelope_document(self, envelope: _Envelope):
+        url = self.envelope_url(envelope.envelope_id)
+        links = {'self': {'href': url}, 'submissionEnvelope': {'href': url},
+                 'submissionEvent': {'href': f'{url}/submissionEvent'}}
+        links.update({entity_type: {'href': f'{url}/{entity_type}'} for entity_type in ENTITY_TYPES})
+        return {
+            'uuid': {'uuid': envelope.uuid},
+            'submissionState': envelope.state(self.state_seconds),
+            'stagingDetails': None,
+            '_links': links
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stand-in', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    ROUTES = [
+        ('POST', re.compile(r'^/submissionEnvelopes/?$'), 'create_envelope'),
+        ('GET', re.compile(r'^/submissionEnvelopes/(?P<envelope_id>[^/]+)$'), 'get_envelope'),
+        ('PATCH', re.compile(r'^/submissionEnvelopes/(?P<envelope_id>[^/]+)$'), 'get_envelope'),
+        ('PUT', re.compile(r'^/submissionEnvelopes/(?P<envelope_id>[^/]+)/submissionEvent$'), 'submit_envelope'),
+        ('GET', re.compile(r'^/submissionEnvelopes/(?P<envelope_id>[^/]+)/(?P<entity_type>[^/]+)$'), 'list_entities')
+    ]
+
+    @property
+    def stand_in(self) -> IngestStandIn:
+        return self.server.stand_in
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    def do_PUT(self):
+        self._route('PUT')
+
+    def do_PATCH(self):
+        self._route('PATCH')
+
+    def _route(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)  # request bodies are accepted but not looked at
+        stand_in = self.stand_in
+        with stand_in._lock:
+            overloaded = stand_in.max_in_flight is not None and stand_in.in_flight >= stand_in.max_in_flight
+            if overloaded:
+                stand_in.rejected += 1
+            else:
+                stand_in.in_flight += 1
+        if overloaded:
+            return self.send_json(429, {'error': 'too many requests'}, {'Retry-After': str(stand_in.retry_after)})
+        try:
+            self._dispatch(method)
+        finally:
+            with stand_in._lock:
+                stand_in.in_flight -= 1
+
+    def _dispatch(self, method):
+        if self.stand_in.latency:
+            time.sleep(self.stand_in.latency)
+        parsed = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        for route_method, pattern, handler in self.ROUTES:
+            match = pattern.match(parsed.path)
+            if route_method == method and match:
+                return getattr(self, handler)(query, **match.groupdict())
+        self.send_json(404, {'error': f'no stand-in route for {method} {parsed.path}'})
+
+    def create_envelope(self, query):
+        envelope = self.stand_in.create_envelope()
+        self.send_json(201, self.stand_in.envelope_document(envelope))
+
+    def get_envelope(self, query, envelope_id):
+        envelope = self.stand_in.envelopes.get(envelope_id)
+        if envelope is None:
+            return self.send_json(404, {'error': f'no envelope {envelope_id}'})
+        self.send_json(200, self.stand_in.envelope_document(envelope))
+
+    def submit_envelope(self, query, envelope_id):
+        envelope = self.stand_in.envelopes.get(envelope_id)
+        if envelope is None:
+            return self.send_json(404, {'error': f'no envelope {envelope_id}'})
+        state = envelope.state(self.stand_in.state_seconds)
+        if state != 'Valid':
+            return self.send_json(409, {'error': f'envelope {envelope_id} is {state}, not Valid'})
+        envelope.submitted_at = time.time()
+        self.send_json(202, self.stand_in.envelope_document(envelope))
+
+    def list_entities(self, query, envelope_id, entity_type):
+        total = self.stand_in.entity_counts.get(entity_type, 0)
+        size = int(query.get('size', self.stand_in.page_size or max(total, 1)))
+        number = int(query.get('page', 0))
+        first, last = number * size, min(total, (number + 1) * size)
+        listing_url = f'{self.stand_in.envelope_url(envelope_id)}/{entity_type}'
+        links = {'self': {'href': f'{listing_url}?page={number}&size={size}'}}
+        if last < total:
+            links['next'] = {'href': f'{listing_url}?page={number + 1}&size={size}'}
+        page = {'size': size, 'totalElements': total, 'totalPages': -(-total // size), 'number': number}
+
+        fixture = HalFixture(base_url=self.stand_in.url)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/hal+json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        pending = [f'{{"_embedded":{{"{entity_type}":[']
+        pending_length = 0
+        for index in range(first, last):
+            separator = ',' if index > first else ''
+            text = separator + json.dumps(fixture.entity(entity_type, index))
+            pending.append(text)
+            pending_length += len(text)
+            if pending_length > 64 * 1024:
+                self._write_chunk(''.join(pending))
+                pending, pending_length = [], 0
+        pending.append(f']}},"_links":{json.dumps(links)},"page":{json.dumps(page)}}}')
+        self._write_chunk(''.join(pending))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def send_json(self, status, document, headers: dict = None):
+        body = json.dumps(document).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/hal+json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+
+    def log_message(self, format, *args):
+        pass
@@ -2,7 +2,9 @@ from unittest import TestCase
 
 from tests import config
 from tests.fixtures.dataset_fixture import DatasetFixture
+from tests.harness import harness_test
 from tests.ingest_agents import IngestApiAgent
+from tests.pool import SubmissionPool
 from tests.runners.dataset_runner import DatasetRunner
 from tests.utils import Progress
 
@@ -10,10 +12,15 @@ from tests.utils import Progress
 class AddBundleTest(TestCase):
 
     def setUp(self) -> None:
-        self.runner = DatasetRunner(config.deployment)
+        self.deployment = config.deployment
+        self.runner = DatasetRunner(self.deployment)
 
+    def tearDown(self) -> None:
+        self.runner.close()
+
+    @harness_test
     def test_run(self) -> None:
-        primary_submission = self._submit_dataset('SS2')
+        primary_submission = self._primary_submission()
         projects = primary_submission.retrieve_projects()
         self.assertEqual(1, len(projects))
 
@@ -25,6 +32,14 @@ class AddBundleTest(TestCase):
         added_bundles = addition_submission.get_bundle_manifests()
         self.assertEqual(1, len(added_bundles), msg='Expected exactly 1 bundle to be added.')
 
+    def _primary_submission(self) -> IngestApiAgent.SubmissionEnvelope:
+        pool = SubmissionPool.configured(config.deployment)
+        primary_submission = pool.acquire(self.runner.ingest_api) if pool else None
+        if primary_submission:
+            Progress.report(f'Using pooled primary submission {primary_submission.url}')
+            return primary_submission
+        return self._submit_dataset('SS2')
+
     def _submit_dataset(self, dataset_name, project_uuid=None) -> IngestApiAgent.SubmissionEnvelope:
         dataset_fixture = DatasetFixture(dataset_name, config.deployment)
         self.runner.complete_run(dataset_fixture, project_uuid=project_uuid)
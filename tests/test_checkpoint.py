@@ -0,0 +1,133 @@
+import json
+import os
+import stat
+import tempfile
+import time
+from unittest import TestCase
+
+from tests.checkpoint import Checkpoint
+from tests.deadline import Deadline
+from tests.deployments import Deployment
+from tests.runners.submission_manager import SubmissionManager
+from tests.runners.update_submission_runner import UpdateSubmissionRunner
+from tests.stand_in import IngestStandIn
+
+SCENARIO = 'update-submission'
+
+
+class CheckpointTest(TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_without_a_directory_nothing_is_saved(self):
+        checkpoint = Checkpoint.for_scenario(SCENARIO, 'dev', directory=None)
+        checkpoint.complete('primary_uploaded', primary_url='http://x')
+        self.assertIsNone(checkpoint.path)
+        self.assertTrue(checkpoint.done('primary_uploaded'))
+
+    def test_saved_stages_are_loaded_again(self):
+        checkpoint = Checkpoint.for_scenario(SCENARIO, 'dev', directory=self.directory)
+        checkpoint.complete('primary_uploaded', primary_url='http://x')
+        checkpoint.complete('primary_staged')
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(checkpoint.path).st_mode))
+
+        loaded = Checkpoint.for_scenario(SCENARIO, 'dev', directory=self.directory)
+        self.assertEqual(['primary_uploaded', 'primary_staged'], loaded.stages)
+        self.assertEqual('primary_staged', loaded.stage)
+        self.assertEqual('http://x', loaded['primary_url'])
+
+        loaded.delete()
+        self.assertFalse(os.path.exists(checkpoint.path))
+        self.assertIsNone(Checkpoint.for_scenario(SCENARIO, 'dev', directory=self.directory).stage)
+
+    def test_stale_checkpoint_is_discarded(self):
+        checkpoint = Checkpoint.for_scenario(SCENARIO, 'dev', directory=self.directory)
+        checkpoint.complete('primary_uploaded', primary_url='http://x')
+        with open(checkpoint.path) as f:
+            saved = json.load(f)
+        saved['updated_at'] = time.time() - 7200
+        with open(checkpoint.path, 'w') as f:
+            json.dump(saved, f)
+
+        self.assertEqual(['primary_uploaded'],
+                         Checkpoint.for_scenario(SCENARIO, 'dev', directory=self.directory, max_age=10800).stages)
+        self.assertEqual([], Checkpoint.for_scenario(SCENARIO, 'dev', directory=self.directory, max_age=3600).stages)
+        self.assertFalse(os.path.exists(checkpoint.path))
+
+
+class ResumeTest(TestCase):
+    """ Resuming the update submission scenario from a checkpoint, against a stand-in whose envelopes move instantly """
+
+    def setUp(self):
+        self.stand_in = IngestStandIn(state_seconds=0).start()
+        self.ingest_api = Deployment('stand-in', api_url=self.stand_in.url, authenticated=False).api_agent()
+        self.checkpoint = Checkpoint(scenario=SCENARIO, deployment='stand-in')
+        self.runner = UpdateSubmissionRunner('stand-in', None, self.ingest_api, None, checkpoint=self.checkpoint)
+        # a resume that waits for a state the envelope has already passed would otherwise never return
+        self.deadline = Deadline(10, name='resume').start()
+
+    def tearDown(self):
+        self.deadline.finish()
+        self.ingest_api.close()
+        self.stand_in.stop()
+
+    def envelope(self, submitted=False):
+        envelope = self.ingest_api.create_envelope()
+        if submitted:
+            envelope.submit()
+        return self.ingest_api.envelope(url=envelope.url)
+
+    def test_has_reached(self):
+        manager = SubmissionManager(self.envelope(submitted=True))
+        self.assertTrue(manager.has_reached('Valid'))
+        self.assertTrue(manager.has_reached('Complete'))
+        manager = SubmissionManager(self.envelope())
+        self.assertTrue(manager.has_reached('Valid'))
+        self.assertFalse(manager.has_reached('Submitted'))
+
+    def test_update_completed_after_it_was_checkpointed_as_submitted(self):
+        update = self.envelope(submitted=True)
+        self.checkpoint.complete('update_uploaded', update_url=update.url)
+        self.checkpoint.complete('update_submitted')
+        self.assertEqual(update.url, self.runner.run_update_submission(None).url)
+
+    def test_update_submitted_before_the_checkpoint_was_saved(self):
+        update = self.envelope(submitted=True)
+        submitted_at = self.stand_in.envelopes[update.url.rsplit('/', 1)[1]].submitted_at
+        self.checkpoint.complete('update_uploaded', update_url=update.url)
+
+        self.runner.run_update_submission(None)
+        self.assertTrue(self.checkpoint.done('update_submitted'))
+        self.assertEqual(submitted_at, self.stand_in.envelopes[update.url.rsplit('/', 1)[1]].submitted_at)
+
+    def test_update_not_yet_submitted_is_submitted(self):
+        update = self.envelope()
+        self.checkpoint.complete('update_uploaded', update_url=update.url)
+        self.runner.run_update_submission(None)
+        self.assertIsNotNone(self.stand_in.envelopes[update.url.rsplit('/', 1)[1]].submitted_at)
+
+    def test_primary_submitted_before_the_checkpoint_was_saved(self):
+        primary = self.envelope(submitted=True)
+        self.checkpoint.complete('primary_uploaded', primary_url=primary.url)
+        self.checkpoint.complete('primary_staged')
+        self.assertEqual(primary.url, self.runner.run_primary_submission('SS2').url)
+        self.assertTrue(self.checkpoint.done('primary_submitted'))
+
+    def test_checkpoint_naming_a_missing_or_invalid_envelope_is_discarded(self):
+        self.checkpoint.complete('primary_uploaded', primary_url=self.envelope(submitted=True).url)
+        self.assertTrue(self.runner._check_checkpoint_envelopes())
+
+        invalid = self.envelope()
+        self.stand_in.envelopes[invalid.url.rsplit('/', 1)[1]].state = lambda state_seconds: 'Invalid'
+        self.checkpoint.complete('update_uploaded', update_url=invalid.url)
+        self.assertFalse(self.runner._check_checkpoint_envelopes())
+        self.assertIsNone(self.checkpoint.stage)
+
+        self.checkpoint.complete('primary_uploaded', primary_url=f'{self.stand_in.url}/submissionEnvelopes/missing')
+        self.assertFalse(self.runner._check_checkpoint_envelopes())
+        self.assertIsNone(self.checkpoint.stage)
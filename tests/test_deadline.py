@@ -0,0 +1,78 @@
+import threading
+import time
+from unittest import TestCase
+
+from tests import deadline
+from tests.deadline import Deadline, DeadlineExceeded
+from tests.utils import Timeout
+
+
+class DeadlineTest(TestCase):
+
+    def test_unbounded_without_a_deadline(self):
+        self.assertIsNone(deadline.current())
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(5, deadline.timeout(5))
+
+    def test_inner_deadline_cannot_outlast_outer(self):
+        with Deadline(0.5, name='outer') as outer, Deadline(100, name='inner') as inner:
+            self.assertIs(inner, deadline.current())
+            self.assertLessEqual(deadline.remaining(), 0.5)
+            self.assertEqual(inner.expires_at, outer.expires_at)
+        self.assertIsNone(deadline.current())
+
+    def test_sleep_stops_at_the_deadline(self):
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded), Deadline(0.1):
+            deadline.sleep(5)
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_cancelling_outer_expires_inner(self):
+        with Deadline(100) as outer, Deadline(100) as inner:
+            outer.cancel()
+            self.assertTrue(inner.expired())
+            with self.assertRaises(DeadlineExceeded):
+                deadline.check()
+
+    def test_deadlines_are_local_to_a_thread_unless_propagated(self):
+        seen = {}
+
+        def plain():
+            seen['plain'] = deadline.current()
+
+        def propagated():
+            seen['propagated'] = deadline.current()
+
+        with Deadline(100) as scenario:
+            for target in (plain, deadline.propagate(propagated)):
+                thread = threading.Thread(target=target)
+                thread.start()
+                thread.join()
+        self.assertIsNone(seen['plain'])
+        self.assertIs(scenario, seen['propagated'])
+
+
+class TimeoutTest(TestCase):
+
+    def test_own_expiry_is_swallowed(self):
+        with Timeout(0.1) as timeout:
+            deadline.sleep(5)
+        self.assertTrue(timeout.did_timeout)
+
+    def test_other_errors_are_raised(self):
+        with self.assertRaises(ValueError), Timeout(100) as timeout:
+            raise ValueError()
+        self.assertFalse(timeout.did_timeout)
+
+    def test_outer_deadline_running_out_is_raised(self):
+        with self.assertRaises(DeadlineExceeded), Deadline(0.1, name='scenario'):
+            with Timeout(100) as timeout:
+                deadline.sleep(5)
+            self.fail('the scenario budget ran out inside the Timeout')
+        self.assertTrue(timeout.did_timeout)
+
+    def test_outer_deadline_cancelled_is_raised(self):
+        with self.assertRaises(DeadlineExceeded), Deadline(100) as scenario:
+            with Timeout(100):
+                scenario.cancel()
+                deadline.check()
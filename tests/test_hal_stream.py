@@ -0,0 +1,114 @@
+import json
+from unittest import TestCase
+
+import requests
+
+from tests import hal_stream
+from tests.fixtures.hal_fixture import HalFixture
+from tests.hal_stream import HalPage, JsonStream
+from tests.stand_in import IngestStandIn
+
+
+def chunked(data: bytes, size):
+    return [data[offset:offset + size] for offset in range(0, len(data), size)]
+
+
+class JsonStreamTest(TestCase):
+
+    def test_reads_values_split_at_every_byte(self):
+        data = b'{"name": "caf\xc3\xa9 \xe2\x98\x83", "count": 12345, "ok": true, "nothing": null}'
+        for size in range(1, len(data) + 1):
+            stream = JsonStream(chunked(data, size))
+            stream.expect('{')
+            values = {}
+            while True:
+                key = stream.read_value()
+                stream.expect(':')
+                values[key] = stream.read_value()
+                if stream.expect(',', '}') == '}':
+                    break
+            self.assertEqual({'name': 'café ☃', 'count': 12345, 'ok': True, 'nothing': None}, values,
+                             f'chunks of {size} bytes')
+            self.assertEqual('', stream.peek())
+
+    def test_number_at_chunk_boundary_is_not_cut_short(self):
+        stream = JsonStream([b'[12', b'34', b'5]'])
+        stream.expect('[')
+        self.assertEqual(12345, stream.read_value())
+        self.assertEqual(']', stream.expect(']'))
+
+    def test_unexpected_character(self):
+        stream = JsonStream([b'[1]'])
+        with self.assertRaises(ValueError):
+            stream.expect('{')
+
+    def test_truncated_document(self):
+        stream = JsonStream([b'{"name": "unfinished'])
+        stream.expect('{')
+        stream.read_value()
+        stream.expect(':')
+        with self.assertRaises(ValueError):
+            stream.read_value()
+
+
+class HalPageTest(TestCase):
+
+    def setUp(self):
+        self.fixture = HalFixture()
+
+    def page_document(self, entities, entity_type='files', **extra):
+        document = {'_embedded': {entity_type: entities}, '_links': {'self': {'href': 'http://localhost/files'}},
+                    'page': {'size': 20, 'totalElements': len(entities), 'totalPages': 1, 'number': 0}}
+        document.update(extra)
+        return json.dumps(document, ensure_ascii=False).encode('utf-8')
+
+    def test_yields_entities_and_reads_links_and_page(self):
+        entities = list(self.fixture.entities('files', 5))
+        entities[2]['fileName'] = 'ünïcødé_☃.fastq.gz'
+        data = self.page_document(entities)
+        for size in (1, 7, 64, len(data)):
+            page = HalPage(chunked(data, size), 'files')
+            self.assertEqual(entities, list(page), f'chunks of {size} bytes')
+            self.assertEqual({'self': {'href': 'http://localhost/files'}}, page.links)
+            self.assertEqual(5, page.page['totalElements'])
+
+    def test_empty_embedded(self):
+        for document in (b'{}', b'{"_embedded": {}, "page": {"number": 0}}', b'{"_embedded": {"files": []}}'):
+            page = HalPage([document], 'files')
+            self.assertEqual([], list(page), document)
+
+    def test_links_before_embedded_and_other_entity_types(self):
+        files = list(self.fixture.entities('files', 2))
+        document = {'_links': {'next': {'href': 'http://localhost/files?page=1'}},
+                    '_embedded': {'biomaterials': list(self.fixture.entities('biomaterials', 3)), 'files': files},
+                    'unrelated': [1, {'nested': [2]}]}
+        page = HalPage([json.dumps(document).encode('utf-8')], 'files')
+        self.assertEqual(files, list(page))
+        self.assertEqual('http://localhost/files?page=1', page.links['next']['href'])
+
+    def test_fields_are_projected(self):
+        data = self.page_document(list(self.fixture.entities('files', 3)))
+        page = HalPage([data], 'files', fields=('uuid.uuid', 'dataFileUuid', 'not.there'))
+        for index, entity in enumerate(page):
+            expected = self.fixture.entity('files', index)
+            self.assertEqual({'uuid': {'uuid': expected['uuid']['uuid']}, 'dataFileUuid': expected['dataFileUuid']},
+                             entity)
+
+
+class StreamEntitiesTest(TestCase):
+
+    def test_follows_next_links_across_pages(self):
+        with IngestStandIn(entity_counts={'files': 25, 'biomaterials': 0}, page_size=10) as stand_in, \
+                requests.Session() as session:
+            listing_url = f'{stand_in.envelope_url()}/files'
+            uuids = [entity['uuid']['uuid'] for entity in
+                     hal_stream.stream_entities(session, listing_url, 'files', fields=('uuid.uuid',))]
+            expected = [entity['uuid']['uuid'] for entity in HalFixture().entities('files', 25)]
+            self.assertEqual(expected, uuids)
+
+            first_page = list(hal_stream.stream_entities(session, listing_url, 'files', follow=False))
+            self.assertEqual(10, len(first_page))
+
+            empty = list(hal_stream.stream_entities(session, f'{stand_in.envelope_url()}/biomaterials',
+                                                    'biomaterials'))
+            self.assertEqual([], empty)
@@ -2,14 +2,16 @@
 import os
 import unittest
 
-import requests
 from ingest.api.ingestapi import IngestApi
 from ingest.utils.s2s_token_client import S2STokenClient
 from ingest.utils.token_manager import TokenManager
 
+from tests import hal_stream, http_client, verification
+from tests.deployments import DEPLOYMENTS
 from tests.fixtures.analysis_submission_fixture import AnalysisSubmissionFixture
 from tests.fixtures.dataset_fixture import DatasetFixture
 from tests.fixtures.metadata_fixture import MetadataFixture
+from tests.harness import harness_test
 from tests.ingest_agents import IngestUIAgent, IngestApiAgent
 from tests.runners.analysis_submission_runner import AnalysisSubmissionRunner
 from tests.runners.big_submission_runner import BigSubmissionRunner
@@ -17,8 +19,6 @@ from tests.runners.dataset_runner import DatasetRunner
 from tests.runners.submission_manager import SubmissionManager
 from tests.runners.update_submission_runner import UpdateSubmissionRunner
 
-DEPLOYMENTS = ('dev', 'integration', 'staging')
-
 
 class TestIngest(unittest.TestCase):
 
@@ -28,7 +28,8 @@ class TestIngest(unittest.TestCase):
         if self.deployment not in DEPLOYMENTS:
             raise RuntimeError(f'DEPLOYMENT_ENV environment variable must be one of {DEPLOYMENTS}')
 
-        self.ingest_client_api = IngestApi(url=f"https://api.ingest.{self.deployment}.data.humancellatlas.org")
+        self.ingest_client_api = http_client.instrument(
+            IngestApi(url=f"https://api.ingest.{self.deployment}.data.humancellatlas.org"))
         self.s2s_token_client = S2STokenClient()
         gcp_credentials_file = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
         self.s2s_token_client.setup_from_file(gcp_credentials_file)
@@ -36,15 +37,22 @@ class TestIngest(unittest.TestCase):
         self.ingest_broker = IngestUIAgent(self.deployment)
         self.ingest_api = IngestApiAgent(deployment=self.deployment)
 
+    def tearDown(self):
+        self.ingest_client_api.session.close()
+        self.ingest_broker.close()
+        self.ingest_api.close()
+
     def ingest_and_upload_only(self, dataset_name):
         dataset_fixture = DatasetFixture(dataset_name, self.deployment)
         runner = DatasetRunner(self.deployment)
+        self.addCleanup(runner.close)
         runner.valid_run(dataset_fixture)
         return runner
 
     def ingest(self, dataset_name):
         dataset_fixture = DatasetFixture(dataset_name, self.deployment)
         runner = DatasetRunner(self.deployment)
+        self.addCleanup(runner.close)
         runner.complete_run(dataset_fixture)
         return runner
 
@@ -58,19 +66,19 @@ class TestIngest(unittest.TestCase):
 
     # TODO move this to ingest client api
     def _get_entities(self, url, entity_type):
-        r = requests.get(url, headers={'Content-type': 'application/json'})
-        r.raise_for_status()
-        response = r.json()
+        return list(hal_stream.stream_entities(self.ingest_api.session, url, entity_type,
+                                               headers={'Content-type': 'application/json'}))
 
-        if response.get('_embedded') and response['_embedded'].get(entity_type):
-            return response['_embedded'][entity_type]
-        else:
-            return []
+    def _stream_uuids(self, url, entity_type):
+        entities = hal_stream.stream_entities(self.ingest_api.session, url, entity_type, fields=('uuid.uuid',),
+                                              headers={'Content-type': 'application/json'})
+        return (entity['uuid']['uuid'] for entity in entities)
 
     def ingest_analysis(self, dataset_name):
         analysis_fixture = AnalysisSubmissionFixture()
         runner = AnalysisSubmissionRunner(self.deployment, self.ingest_broker, self.ingest_api, self.token_manager,
                                           self.ingest_client_api)
+        self.addCleanup(runner.close)
         dataset_fixture = DatasetFixture(dataset_name, self.deployment)
         runner.run(dataset_fixture, analysis_fixture)
 
@@ -79,28 +87,26 @@ class TestIngest(unittest.TestCase):
 
         derived_files_url = runner.analysis_process['_links']['derivedFiles'][
             'href']
-        derived_files = self._get_entities(derived_files_url, 'files')
-        analysis_files = runner.analysis_submission.get_files()
+        derived_files = verification.compare(
+            expected=(file.uuid for file in runner.analysis_submission.views('files')),
+            actual=self._stream_uuids(derived_files_url, 'files'),
+            description='derived files of the analysis process')
 
-        derived_file_uuids = [file['uuid']['uuid'] for file in derived_files]
-        analysis_file_uuids = [file['uuid']['uuid'] for file in analysis_files]
+        self.assertTrue(derived_files.actual_count, 'There must be files in the analysis submission')
 
-        self.assertTrue(derived_file_uuids, 'There must be files in the analysis submission')
-
-        self.assertEqual(derived_file_uuids, analysis_file_uuids,
-                         'The analyses files must be linked to the analyses process.')
+        self.assertTrue(derived_files.ok,
+                        f'The analyses files must be linked to the analyses process. {derived_files}')
 
         input_files_url = runner.analysis_process['_links']['inputFiles'][
             'href']
-        input_files = self._get_entities(input_files_url, 'files')
-        primary_submission_files = runner.primary_submission.get_files()
-
-        input_file_uuids = [file['uuid']['uuid'] for file in input_files]
-        primary_submission_file_uuids = [file['uuid']['uuid'] for file in primary_submission_files]
+        input_files = verification.compare(
+            expected=(file.uuid for file in runner.primary_submission.views('files')),
+            actual=self._stream_uuids(input_files_url, 'files'),
+            description='input files of the analysis process')
 
-        self.assertTrue(input_file_uuids, 'There must be files from the primary submission')
-        self.assertEqual(input_file_uuids, primary_submission_file_uuids,
-                         'The primary submission files must be linked to the analyses process.')
+        self.assertTrue(input_files.actual_count, 'There must be files from the primary submission')
+        self.assertTrue(input_files.ok,
+                        f'The primary submission files must be linked to the analyses process. {input_files}')
 
         input_bundle_manifest_url = \
             runner.analysis_process['_links']['inputBundleManifests']['href']
@@ -118,6 +124,7 @@ class TestIngest(unittest.TestCase):
     def ingest_big_submission(self):
         metadata_fixture = MetadataFixture()
         runner = BigSubmissionRunner(self.deployment, self.ingest_client_api, self.token_manager)
+        self.addCleanup(runner.close)
         runner.run(metadata_fixture)
 
     def ingest_updates(self):
@@ -125,22 +132,29 @@ class TestIngest(unittest.TestCase):
         runner.run()
 
         self.assertEqual(len(runner.updated_bundle_fqids), 1, "There should be 1 bundle updated.")
+        self.assertIn(runner.project_uuid, runner.snapshot_diff.changed_uuids('content'),
+                      f"The project content should have been updated. Changes were: {runner.snapshot_diff}")
 
 
 class TestRun(TestIngest):
 
+    @harness_test
     def test_ss2_ingest_to_upload(self):
         runner = self.ingest_and_upload_only('SS2')
 
+    @harness_test
     def test_ss2_ingest_to_dss(self):
         runner = self.ingest('SS2')
 
+    @harness_test
     def test_10x_analysis_run(self):
         analysis_runner = self.ingest_analysis('10x')
 
+    @harness_test
     def test_big_submission_run(self):
         runner = self.ingest_big_submission()
 
+    @harness_test
     def test_updates_run(self):
         runner = self.ingest_updates()
 
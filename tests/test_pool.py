@@ -0,0 +1,87 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from tests.deployments import Deployment
+from tests.pool import PoolEntry, SubmissionPool
+from tests.stand_in import IngestStandIn
+
+
+class RecordingPool(SubmissionPool):
+    """ A pool that records the refills it would start rather than building submissions """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.refills = 0
+
+    def refill_in_background(self):
+        self.refills += 1
+
+
+class SubmissionPoolTest(TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        self.stand_in = IngestStandIn(state_seconds=0).start()
+        self.deployment = Deployment('stand-in', api_url=self.stand_in.url, authenticated=False)
+        self.ingest_api = self.deployment.api_agent()
+
+    def tearDown(self):
+        self.ingest_api.close()
+        self.stand_in.stop()
+        self._directory.cleanup()
+
+    def pool(self, size=2):
+        return RecordingPool(self.deployment, directory=self.directory, size=size, max_age=3600)
+
+    def envelope_url(self, submitted=True):
+        envelope = self.ingest_api.create_envelope()
+        if submitted:
+            envelope.submit()
+        return envelope.url
+
+    def test_each_submission_is_handed_out_once(self):
+        pool = self.pool()
+        urls = [self.envelope_url(), self.envelope_url()]
+        for url in urls:
+            pool.add(PoolEntry(url))
+        self.assertEqual(urls, [pool.acquire(self.ingest_api, refill=False).url for _ in urls])
+        self.assertIsNone(pool.acquire(self.ingest_api, refill=False))
+
+    def test_stale_and_incomplete_submissions_are_dropped(self):
+        pool = self.pool()
+        pool.add(PoolEntry(self.envelope_url(), created_at=time.time() - 7200))
+        pool.add(PoolEntry(self.envelope_url(submitted=False)))
+        pool.add(PoolEntry(f'{self.stand_in.url}/submissionEnvelopes/missing'))
+        complete = self.envelope_url()
+        pool.add(PoolEntry(complete))
+        self.assertEqual(complete, pool.acquire(self.ingest_api, refill=False).url)
+        self.assertEqual([], pool.entries())
+
+    def test_refill_is_started_only_below_size(self):
+        pool = self.pool(size=1)
+        for _ in range(2):
+            pool.add(PoolEntry(self.envelope_url()))
+        pool.acquire(self.ingest_api, refill=True)
+        self.assertEqual(0, pool.refills)
+        pool.acquire(self.ingest_api, refill=True)
+        self.assertEqual(1, pool.refills)
+        pool.acquire(self.ingest_api, refill=False)
+        self.assertEqual(1, pool.refills)
+
+    def test_refill_is_not_started_while_the_pool_is_being_filled(self):
+        pool = SubmissionPool(self.deployment, directory=self.directory, size=1)
+        with pool._filling() as filling:
+            self.assertTrue(filling)
+            self.assertIsNone(pool.refill_in_background())
+            self.assertEqual([], pool.fill(wait=False))
+
+    def test_refill_runs_in_a_process_of_its_own(self):
+        pool = SubmissionPool(self.deployment, directory=self.directory, size=1)
+        pool.add(PoolEntry(self.envelope_url()))
+        process = pool.refill_in_background()
+        self.assertEqual(0, process.wait(timeout=60))
+        with open(os.path.join(self.directory, 'pool-stand-in.refill.log')) as log:
+            self.assertIn(self.stand_in.url, log.read())
@@ -0,0 +1,117 @@
+import threading
+import time
+from email.utils import formatdate
+from unittest import TestCase
+
+import requests
+
+from tests import http_client, metrics, traffic
+from tests.stand_in import IngestStandIn
+from tests.traffic import AdaptiveLimit, TokenBucket
+
+
+class EndpointClassTest(TestCase):
+
+    def test_classes(self):
+        api = 'https://api.ingest.dev.data.humancellatlas.org'
+        self.assertEqual('poll', traffic.endpoint_class('GET', f'{api}/submissionEnvelopes/abc'))
+        self.assertEqual('list', traffic.endpoint_class('GET', f'{api}/submissionEnvelopes/abc/files'))
+        self.assertEqual('write', traffic.endpoint_class('put', f'{api}/submissionEnvelopes/abc/submissionEvent'))
+        self.assertEqual('upload', traffic.endpoint_class('POST', 'https://ingest.dev.data.humancellatlas.org'
+                                                                  '/api_upload'))
+
+
+class RetryAfterTest(TestCase):
+
+    @staticmethod
+    def response(retry_after):
+        response = requests.Response()
+        if retry_after is not None:
+            response.headers['Retry-After'] = retry_after
+        return response
+
+    def test_seconds_and_dates(self):
+        self.assertEqual(3.0, traffic.retry_after_seconds(self.response('3')))
+        self.assertAlmostEqual(30, traffic.retry_after_seconds(self.response(formatdate(time.time() + 30))), delta=2)
+        self.assertEqual(0.0, traffic.retry_after_seconds(self.response(formatdate(time.time() - 30))))
+
+    def test_missing_or_unreadable(self):
+        self.assertIsNone(traffic.retry_after_seconds(self.response(None)))
+        self.assertIsNone(traffic.retry_after_seconds(self.response('soon')))
+
+
+class TokenBucketTest(TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=20, burst=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.take()
+        self.assertLess(time.monotonic() - start, 0.05)
+        for _ in range(4):
+            bucket.take()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+
+class AdaptiveLimitTest(TestCase):
+
+    @staticmethod
+    def complete(limit, latency, endpoint, overloaded=False):
+        limit.acquire()
+        limit._last_decrease = float('-inf')  # as if a round trip had passed since the last decrease
+        limit.release(latency=latency, overloaded=overloaded, endpoint=endpoint)
+
+    def test_grows_while_fast(self):
+        limit = AdaptiveLimit(initial=4, maximum=10)
+        for _ in range(500):
+            self.complete(limit, 0.02, 'poll')
+        self.assertEqual(10, limit.limit)
+
+    def test_overload_halves(self):
+        limit = AdaptiveLimit(initial=8)
+        self.complete(limit, 0.01, 'poll', overloaded=True)
+        self.assertEqual(4, limit.limit)
+
+    def test_slow_endpoint_class_is_not_compared_with_fast_one(self):
+        limit = AdaptiveLimit(initial=8, maximum=64)
+        for index in range(5000):
+            listing = index % 5 == 0
+            self.complete(limit, 1.0 if listing else 0.02, 'list' if listing else 'poll')
+        self.assertEqual(64, limit.limit)
+
+    def test_slow_response_trims(self):
+        limit = AdaptiveLimit(initial=8)
+        self.complete(limit, 0.02, 'poll')
+        before = limit.limit
+        self.complete(limit, 0.5, 'poll')
+        self.assertLess(limit.limit, before)
+
+
+class HarnessSessionRetryTest(TestCase):
+
+    def test_overloaded_requests_are_retried_and_counted(self):
+        measured = metrics.Metrics()
+        with IngestStandIn(entity_counts={'files': 1}, latency=0.05, max_in_flight=1, retry_after=0.05) as stand_in:
+            url = f'{stand_in.envelope_url()}/files'
+            session = http_client.session()
+            statuses = []
+
+            def worker():
+                with metrics.activate(measured):
+                    for _ in range(3):
+                        statuses.append(session.get(url).status_code)
+
+            threads = [threading.Thread(target=worker) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            session.close()
+
+        stats = measured.to_json()['endpoints']['GET /submissionEnvelopes/{id}/files']
+        self.assertTrue(stand_in.rejected, 'the stand-in should have turned some requests away')
+        self.assertEqual(stand_in.rejected, stats['statuses']['429'])
+        # every rejection is retried, and so counted as a retry, unless the retries ran out and it was returned
+        self.assertEqual(stand_in.rejected - statuses.count(429), stats['retries'])
+        self.assertEqual(len(statuses) + stats['retries'], sum(stats['statuses'].values()))
+        self.assertGreater(statuses.count(200), len(statuses) / 2)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import uuid as uuidlib
+from unittest import TestCase
+
+from tests import verification
+from tests.verification import UuidSet
+
+
+def uuids(*numbers):
+    return [str(uuidlib.UUID(int=number)) for number in numbers]
+
+
+class UuidSetTest(TestCase):
+
+    def test_iterates_distinct_values_in_order(self):
+        values = UuidSet().update(uuids(5, 3, 9, 3, 5))
+        self.assertEqual([3, 5, 9], list(values))
+
+    def test_spilled_runs_are_merged_and_removed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            values = UuidSet(max_in_memory=4, directory=directory)
+            values.update(uuids(*range(20, 0, -1), 7, 7, 13))
+            self.assertTrue(os.listdir(directory), 'UUIDs beyond max_in_memory should spill to disk')
+            self.assertEqual(list(range(1, 21)), list(values))
+            values.close()
+            self.assertEqual([], os.listdir(directory))
+
+    def test_accepts_uuids_without_dashes(self):
+        self.assertEqual([255], list(UuidSet().update([uuidlib.UUID(int=255).hex])))
+
+
+class CompareTest(TestCase):
+
+    def test_identical_sets_in_any_order(self):
+        diff = verification.compare(uuids(1, 2, 3), uuids(3, 1, 2))
+        self.assertTrue(diff.ok)
+        self.assertEqual((3, 3, 3), (diff.expected_count, diff.actual_count, diff.matched_count))
+
+    def test_duplicates_are_ignored(self):
+        diff = verification.compare(uuids(1, 2, 2), uuids(2, 1, 1, 1))
+        self.assertTrue(diff.ok)
+        self.assertEqual((2, 2, 2), (diff.expected_count, diff.actual_count, diff.matched_count))
+
+    def test_missing_and_extra(self):
+        diff = verification.compare(uuids(1, 2, 3, 4), uuids(3, 4, 5), description='input files')
+        self.assertFalse(diff.ok)
+        self.assertEqual((4, 3, 2), (diff.expected_count, diff.actual_count, diff.matched_count))
+        self.assertEqual((2, 1), (diff.missing_count, diff.extra_count))
+        self.assertEqual(uuids(1, 2), diff.missing)
+        self.assertEqual(uuids(5), diff.extra)
+        self.assertTrue(str(diff).startswith('input files: 2 matched of 4 expected and 3 found'))
+
+    def test_empty_sides(self):
+        self.assertTrue(verification.compare([], []).ok)
+        only_expected = verification.compare(uuids(1, 2), [])
+        self.assertEqual((2, 0), (only_expected.missing_count, only_expected.extra_count))
+        only_actual = verification.compare([], uuids(1))
+        self.assertEqual((0, 1), (only_actual.missing_count, only_actual.extra_count))
+
+    def test_counts_are_exact_and_samples_bounded(self):
+        diff = verification.compare(uuids(*range(1, 101)), uuids(*range(51, 151)), sample_size=3)
+        self.assertEqual((50, 50, 50), (diff.matched_count, diff.missing_count, diff.extra_count))
+        self.assertEqual(uuids(1, 2, 3), diff.missing)
+        self.assertEqual(uuids(101, 102, 103), diff.extra)
+
+    def test_spilled_comparison_matches_in_memory(self):
+        expected = uuids(*range(0, 1000, 2), 10, 20)
+        actual = uuids(*reversed(range(0, 1000, 3)))
+        in_memory = verification.compare(expected, actual)
+        spilled = verification.compare(expected, actual, max_in_memory=16)
+        for diff in (in_memory, spilled):
+            self.assertEqual(500, diff.expected_count)
+            self.assertEqual(334, diff.actual_count)
+            self.assertEqual(167, diff.matched_count)
+        self.assertEqual(str(in_memory), str(spilled))
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from tests.metrics import nearest_rank
+from tests.context import ContextLocal
+
+SUBMISSION_STATES = ('Draft', 'Validating', 'Valid', 'Submitted', 'Processing', 'Cleanup', 'Complete')
+
+
+class StateDuration:
+    """
+    How long an envelope stayed in a state. Polling only tells us the state was entered somewhere between the last
+    observation of the previous state and the first observation of this one, and left somewhere between the last
+    observation of this state and the first observation of the next, so the duration is bounded rather than exact.
+    """
+
+    def __init__(self, state, shortest, longest):
+        self.state = state
+        self.shortest = shortest
+        self.longest = longest
+
+    @property
+    def estimate(self):
+        return (self.shortest + self.longest) / 2
+
+    def to_dict(self):
+        return {'state': self.state, 'shortest': self.shortest, 'longest': self.longest, 'estimate': self.estimate}
+
+
+class EnvelopeTimeline:
+
+    def __init__(self, envelope, metadata: dict = None, observations: list = None):
+        self.envelope = envelope
+        self.metadata = dict(metadata or {})
+        self.observations = list(observations or [])
+
+    def observe(self, state, at=None):
+        self.observations.append((time.time() if at is None else at, state))
+
+    def runs(self):
+        """ Consecutive observations of the same state collapsed to (state, first seen, last seen) """
+        runs = []
+        for at, state in self.observations:
+            if runs and runs[-1][0] == state:
+                runs[-1][2] = at
+            else:
+                runs.append([state, at, at])
+        return [tuple(run) for run in runs]
+
+    def transitions(self):
+        """ (from state, to state, earliest, latest) bounding when each observed transition happened """
+        runs = self.runs()
+        return [(previous[0], following[0], previous[2], following[1]) for previous, following in zip(runs, runs[1:])]
+
+    def state_durations(self):
+        """
+        Bounded durations of every state the envelope was seen to leave; the current state is still running. The
+        first observed state is measured from its first observation as there is nothing earlier to bound it by.
+        """
+        runs = self.runs()
+        durations = []
+        for index, (state, first_seen, last_seen) in enumerate(runs[:-1]):
+            entered_after = runs[index - 1][2] if index > 0 else first_seen
+            left_before = runs[index + 1][1]
+            durations.append(StateDuration(state, last_seen - first_seen, left_before - entered_after))
+        return durations
+
+    def to_dict(self):
+        return {
+            'envelope': self.envelope,
+            'metadata': self.metadata,
+            'observations': [[at, state] for at, state in self.observations],
+            'transitions': [list(transition) for transition in self.transitions()],
+            'state_durations': [duration.to_dict() for duration in self.state_durations()]
+        }
+
+    @staticmethod
+    def from_dict(source: dict):
+        observations = [(at, state) for at, state in source.get('observations', [])]
+        return EnvelopeTimeline(source['envelope'], metadata=source.get('metadata'), observations=observations)
+
+
+class TimelineRecorder:
+    """
+    Captures every submissionState observed for each envelope so that state durations can be analysed after the run.
+    """
+
+    def __init__(self, metadata: dict = None):
+        self.metadata = dict(metadata or {})
+        self.timelines = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.timelines = {}
+
+    def timeline(self, envelope) -> EnvelopeTimeline:
+        with self._lock:
+            if envelope not in self.timelines:
+                self.timelines[envelope] = EnvelopeTimeline(envelope, metadata=self.metadata)
+            return self.timelines[envelope]
+
+    def observe(self, envelope, state, at=None):
+        timeline = self.timeline(envelope)
+        with self._lock:
+            timeline.observe(state, at=at)
+
+    def annotate(self, envelope, **metadata):
+        """ Attach details such as the number of entities in the submission to the envelope's timeline """
+        timeline = self.timeline(envelope)
+        with self._lock:
+            timeline.metadata.update(metadata)
+
+    def save(self, directory, name=None):
+        """ Write every timeline as a line of JSON to a new file in directory and return its path """
+        os.makedirs(directory, exist_ok=True)
+        name = name or datetime.now().strftime('timelines-%Y%m%dT%H%M%S%f')
+        path = os.path.join(directory, f'{name}.jsonl')
+        with self._lock:
+            timelines = list(self.timelines.values())
+        with open(path, 'w') as f:
+            for timeline in timelines:
+                f.write(json.dumps(timeline.to_dict()) + '\n')
+        return path
+
+
+class TimelineAnalyzer:
+    """
+    Aggregates the state durations of timelines saved across many runs, grouped by submission size.
+    """
+
+    def __init__(self, timelines: list = None):
+        self.timelines = list(timelines or [])
+
+    def load(self, *paths):
+        for path in paths:
+            files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.jsonl')] \
+                if os.path.isdir(path) else [path]
+            for file in files:
+                with open(file) as f:
+                    self.timelines.extend(EnvelopeTimeline.from_dict(json.loads(line)) for line in f if line.strip())
+        return self
+
+    def durations(self, size_key='entities'):
+        """ {state: [(submission size, StateDuration)]} over every loaded timeline """
+        durations = {}
+        for timeline in self.timelines:
+            size = timeline.metadata.get(size_key)
+            for duration in timeline.state_durations():
+                durations.setdefault(duration.state, []).append((size, duration))
+        return durations
+
+    def summarise(self, size_key='entities', buckets=(10, 100, 1000, 10000)):
+        """ Percentiles of the estimated duration of each state, per submission size bucket """
+        summary = {}
+        for state, sized_durations in self.durations(size_key).items():
+            by_bucket = {}
+            for size, duration in sized_durations:
+                by_bucket.setdefault(_bucket(size, buckets), []).append(duration.estimate)
+            summary[state] = {bucket: _distribution(estimates) for bucket, estimates in by_bucket.items()}
+        return summary
+
+
+def _bucket(size, buckets):
+    if size is None:
+        return 'unknown'
+    for upper in buckets:
+        if size <= upper:
+            return f'<={upper}'
+    return f'>{buckets[-1]}'
+
+
+def _distribution(values):
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'p50': nearest_rank(ordered, 0.5),
+        'p95': nearest_rank(ordered, 0.95),
+        'max': ordered[-1]
+    }
+
+
+recorder = TimelineRecorder()
+_current = ContextLocal('timeline', default=recorder)
+
+
+def current() -> TimelineRecorder:
+    return _current.get()
+
+
+@contextmanager
+def activate(timeline_recorder: TimelineRecorder):
+    token = _current.set(timeline_recorder)
+    try:
+        yield timeline_recorder
+    finally:
+        _current.reset(token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarise envelope state durations recorded across runs.')
+    parser.add_argument('paths', nargs='+', help='timeline .jsonl files or directories containing them')
+    parser.add_argument('--size-key', default='entities',
+                        help='timeline metadata used as the submission size, e.g. entities or biomaterials')
+    parser.add_argument('--buckets', default='10,100,1000,10000',
+                        help='comma separated upper bounds of the submission size buckets')
+    args = parser.parse_args()
+
+    buckets = tuple(int(bound) for bound in args.buckets.split(','))
+    summary = TimelineAnalyzer().load(*args.paths).summarise(size_key=args.size_key, buckets=buckets)
+    states = [state for state in SUBMISSION_STATES if state in summary] + \
+             sorted(state for state in summary if state not in SUBMISSION_STATES)
+    print(f'{"state":<12} {args.size_key:>10} {"runs":>6} {"p50 (s)":>10} {"p95 (s)":>10} {"max (s)":>10}')
+    for state in states:
+        for bucket, distribution in sorted(summary[state].items()):
+            print(f'{state:<12} {bucket:>10} {distribution["count"]:>6} {distribution["p50"]:>10.1f} '
+                  f'{distribution["p95"]:>10.1f} {distribution["max"]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
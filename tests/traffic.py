@@ -0,0 +1,204 @@
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from tests import config, deadline, progress
+
+# statuses that mean the server wants us to slow down rather than that the request was wrong
+OVERLOADED_STATUSES = (429, 503)
+
+_ENVELOPE_PATH = re.compile(r'^/submissionEnvelopes/[^/]+/?$')
+
+
+def endpoint_class(method, url):
+    """
+    The class of traffic a request belongs to: 'upload' for spreadsheet uploads to the broker, 'write' for anything
+    else that changes state, 'poll' for reading a single envelope, which is what waiting for a state does, and 'list'
+    for every other read.
+    """
+    method = method.upper()
+    path = urlparse(url).path
+    if path.startswith('/api_upload'):
+        return 'upload'
+    if method not in ('GET', 'HEAD', 'OPTIONS'):
+        return 'write'
+    if _ENVELOPE_PATH.match(path):
+        return 'poll'
+    return 'list'
+
+
+def retry_after_seconds(response):
+    """ Seconds the response's Retry-After header asks us to wait, None if it has none we understand """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """ Admits rate requests a second on average, and up to burst at once after a quiet spell """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """ Take a token, waiting for one within the current deadline """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            deadline.sleep(wait)
+
+
+class AdaptiveLimit:
+    """
+    A limit on concurrent requests that adapts by additive increase, multiplicative decrease: every request that
+    completes promptly raises it by 1/limit, so it grows by about one per limit's worth of requests, while a request
+    that the server rejects as overloaded halves it and one much slower than the best recent latency trims it. The
+    best recent latency is kept per endpoint class, since a listing or an upload takes far longer than polling an
+    envelope even when the server is idle. There is at most one decrease per round trip, so that the requests caught
+    up in one overload only count once.
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64, slow_factor=3.0, window=100):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_factor = slow_factor
+        self.window = window
+        self.in_flight = 0
+        self._latencies = {}
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                deadline.check()
+                self._condition.wait(deadline.timeout(0.1))
+            self.in_flight += 1
+
+    def release(self, latency=None, overloaded=False, endpoint=None):
+        with self._condition:
+            self.in_flight -= 1
+            latencies = self._latencies.setdefault(endpoint, deque(maxlen=self.window))
+            baseline = min(latencies) if latencies else None
+            slow = baseline is not None and latency is not None and latency > baseline * self.slow_factor
+            if latency is not None and not overloaded:  # rejections come back quickly and say nothing of the baseline
+                latencies.append(latency)
+            if overloaded or slow:
+                now = time.monotonic()
+                round_trip = max((max(recent) for recent in self._latencies.values() if recent), default=0.0)
+                if now - self._last_decrease >= round_trip:
+                    self.limit = max(self.minimum, self.limit * (0.5 if overloaded else 0.9))
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class TrafficController:
+    """
+    Paces every request to one host: a token bucket per endpoint class caps the rate of each kind of request, an
+    AdaptiveLimit caps how many are in flight at once, and a Retry-After from the server holds back every request to
+    the host until it has passed.
+    """
+
+    def __init__(self, host, rates: dict = None, max_concurrency=None):
+        self.host = host
+        rates = dict(config.traffic_rates, **(rates or {}))
+        self.buckets = {endpoint: TokenBucket(rate) for endpoint, rate in rates.items()}
+        self.limit = AdaptiveLimit(maximum=max_concurrency or config.traffic_max_concurrency)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @contextmanager
+    def admit(self, method, url):
+        """ Wait until a request may be sent, then yield a dict the caller sets 'latency' and 'overloaded' in """
+        paused = self._paused_until - time.monotonic()
+        if paused > 0:
+            deadline.sleep(paused)
+        endpoint = endpoint_class(method, url)
+        bucket = self.buckets.get(endpoint)
+        if bucket:
+            bucket.take()
+        self.limit.acquire()
+        outcome = {'latency': None, 'overloaded': False}
+        try:
+            yield outcome
+        finally:
+            self.limit.release(latency=outcome['latency'], overloaded=outcome['overloaded'], endpoint=endpoint)
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def controller(url) -> TrafficController:
+    """ The controller shared by every session sending requests to url's host """
+    host = urlparse(url).netloc
+    with _controllers_lock:
+        if host not in _controllers:
+            _controllers[host] = TrafficController(host)
+        return _controllers[host]
+
+
+@contextmanager
+def _unpaced():
+    yield {'latency': None, 'overloaded': False}
+
+
+def admit(method, url):
+    """ TrafficController.admit for url's host, or a no-op if INGEST_TRAFFIC_CONTROL is off """
+    return controller(url).admit(method, url) if config.traffic_control else _unpaced()
+
+
+def wait_out(url, seconds):
+    """ Hold back every request to url's host for seconds, or just this one if traffic control is off """
+    if config.traffic_control:
+        controller(url).pause(seconds)
+    else:
+        deadline.sleep(seconds)
+
+
+def backoff(response, attempt):
+    """
+    Seconds to wait before retrying a request the server rejected as overloaded: what its Retry-After asks for, or
+    exponential backoff without one. None if the request should not be retried because that would outlast the current
+    deadline or the retries are used up.
+    """
+    if attempt >= config.traffic_max_retries:
+        return None
+    wait = retry_after_seconds(response)
+    if wait is None:
+        wait = min(60.0, 2.0 ** attempt)
+    left = deadline.remaining()
+    if left is not None and wait >= left:
+        return None
+    progress.report(f'{response.request.method} {response.url} returned {response.status_code}, '
+                    f'retrying in {wait:.1f}s', level=progress.DEBUG)
+    return wait
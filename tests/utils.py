@@ -1,51 +1,39 @@
-from datetime import datetime
 from contextlib import AbstractContextManager
-import sys
-import signal
 
+from tests import progress
+from tests.deadline import Deadline
 
-class Progress:
-
-    start_time = datetime.now()
-    cursor_column = 0
 
-    @classmethod
-    def report(cls, message):
-        if not message == "":
-            sys.stdout.write(cls._elapsed_time() + " " + message)
-            if not message.endswith("\n"):
-                sys.stdout.write("\n")
-            sys.stdout.flush()
+class Progress:
 
     @classmethod
-    def _elapsed_time(cls):
-        elapsed_delta = datetime.now() - cls.start_time
-        return cls._duration_h_mm_ss(elapsed_delta.seconds)
-
-    @staticmethod
-    def _duration_h_mm_ss(duration_secs):
-        m, s = divmod(duration_secs, 60)
-        h, m = divmod(m, 60)
-        return "%d:%02d:%02d" % (h, m, s)
+    def report(cls, message, level=progress.INFO):
+        if not message.strip() == "":
+            progress.report(message.rstrip("\n"), level=level)
 
 
 class Timeout(AbstractContextManager):
+    """
+    Gives up on the enclosed block after seconds_remaining. This is a Deadline, so it can be nested and used from any
+    thread, but the block only stops at the next HTTP call, poll, sleep or subprocess it makes. Only the Timeout's own
+    expiry is swallowed; if a deadline it is nested in ran out too, DeadlineExceeded carries on to that deadline.
+    """
+
     def __init__(self, seconds_remaining: int) -> None:
         self.did_timeout = False
         self.seconds_remaining = seconds_remaining
+        self._deadline = Deadline(seconds_remaining, name='timeout')
 
     def __enter__(self):
-        def _timeout_handler(signum, frame):
-            self.did_timeout = True
-            raise TimeoutError("time's up!")
-
-        signal.signal(signal.SIGALRM, _timeout_handler)
-        signal.alarm(self.seconds_remaining)
-
+        self._deadline.start()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        signal.signal(signal.SIGALRM, signal.SIG_DFL)
-        signal.alarm(0)
-
-        return (None is exc_type) or (TimeoutError is exc_type)
+        self._deadline.finish()
+        if exc_type is None:
+            return True
+        if not issubclass(exc_type, TimeoutError):
+            return False
+        self.did_timeout = True
+        parent = self._deadline.parent
+        return parent is None or not parent.expired()
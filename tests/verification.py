@@ -0,0 +1,137 @@
+import heapq
+import os
+import tempfile
+import uuid as uuidlib
+
+RECORD_SIZE = 16
+
+
+class UuidSet:
+    """
+    A set of UUIDs held as 128-bit integers. Once it grows past max_in_memory the UUIDs are written to disk as a
+    sorted run and the set starts again, so that memory stays bounded however many UUIDs are added. Iterating yields
+    every distinct UUID, as an integer, in ascending order.
+    """
+
+    def __init__(self, max_in_memory=250000, directory=None):
+        self.max_in_memory = max_in_memory
+        self.directory = directory
+        self._memory = set()
+        self._runs = []
+
+    def add(self, value):
+        self._memory.add(int(str(value).replace('-', ''), 16))
+        if len(self._memory) >= self.max_in_memory:
+            self._spill()
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def _spill(self):
+        run = tempfile.NamedTemporaryFile(prefix='uuid-run-', suffix='.bin', dir=self.directory, delete=False)
+        with run:
+            for value in sorted(self._memory):
+                run.write(value.to_bytes(RECORD_SIZE, 'big'))
+        self._runs.append(run.name)
+        self._memory = set()
+
+    def __iter__(self):
+        previous = None
+        for value in heapq.merge(sorted(self._memory), *(_read_run(path) for path in self._runs)):
+            if value != previous:
+                yield value
+                previous = value
+
+    def close(self):
+        for path in self._runs:
+            os.remove(path)
+        self._runs = []
+        self._memory = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(RECORD_SIZE * 4096)
+            if not block:
+                return
+            for offset in range(0, len(block), RECORD_SIZE):
+                yield int.from_bytes(block[offset:offset + RECORD_SIZE], 'big')
+
+
+class LinkDiff:
+    """
+    The outcome of comparing the entities expected at one end of a link with those actually found there. Counts are
+    exact; only the first sample_size missing and extra UUIDs are kept.
+    """
+
+    def __init__(self, description='', sample_size=10):
+        self.description = description
+        self.sample_size = sample_size
+        self.expected_count = 0
+        self.actual_count = 0
+        self.matched_count = 0
+        self.missing_count = 0
+        self.extra_count = 0
+        self.missing = []
+        self.extra = []
+
+    @property
+    def ok(self):
+        return not self.missing_count and not self.extra_count
+
+    def _missing(self, value):
+        self.missing_count += 1
+        if len(self.missing) < self.sample_size:
+            self.missing.append(str(uuidlib.UUID(int=value)))
+
+    def _extra(self, value):
+        self.extra_count += 1
+        if len(self.extra) < self.sample_size:
+            self.extra.append(str(uuidlib.UUID(int=value)))
+
+    def __str__(self):
+        summary = f'{self.description + ": " if self.description else ""}{self.matched_count} matched of ' \
+                  f'{self.expected_count} expected and {self.actual_count} found'
+        if self.missing_count:
+            summary += f'; {self.missing_count} missing, e.g. {", ".join(self.missing)}'
+        if self.extra_count:
+            summary += f'; {self.extra_count} unexpected, e.g. {", ".join(self.extra)}'
+        return summary
+
+
+def compare(expected, actual, description='', max_in_memory=250000, sample_size=10) -> LinkDiff:
+    """
+    Compare two iterables of UUIDs as sets, ignoring order and duplicates, and report what is missing from actual
+    and what actual has that was not expected. Both sides are streamed so neither needs to fit in memory.
+    """
+    diff = LinkDiff(description=description, sample_size=sample_size)
+    with UuidSet(max_in_memory) as expected_set, UuidSet(max_in_memory) as actual_set:
+        expected_set.update(expected)
+        actual_set.update(actual)
+        expected_iter, actual_iter = iter(expected_set), iter(actual_set)
+        expected_value, actual_value = next(expected_iter, None), next(actual_iter, None)
+        while expected_value is not None or actual_value is not None:
+            if actual_value is None or (expected_value is not None and expected_value < actual_value):
+                diff.expected_count += 1
+                diff._missing(expected_value)
+                expected_value = next(expected_iter, None)
+            elif expected_value is None or actual_value < expected_value:
+                diff.actual_count += 1
+                diff._extra(actual_value)
+                actual_value = next(actual_iter, None)
+            else:
+                diff.expected_count += 1
+                diff.actual_count += 1
+                diff.matched_count += 1
+                expected_value, actual_value = next(expected_iter, None), next(actual_iter, None)
+    return diff
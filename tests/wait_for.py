@@ -1,6 +1,7 @@
 import time
 
 from . import logger
+from . import deadline, progress
 from .utils import Progress
 
 
@@ -25,9 +26,10 @@ class WaitFor:
 
         while True:
             retval = self.func(*self.func_args)
-            Progress.report(f"  {self.func.__name__} returned {retval}")
+            Progress.report(f"  {self.func.__name__} returned {retval}", level=progress.DEBUG)
             if retval == value:
                 return retval
+            deadline.check()
             if timeout_at and time.time() > timeout_at:
                 raise TimedOut(f"Function {self.func.__name__} did not return value {value} " +
                                f" within {timeout_seconds} seconds")
@@ -39,14 +41,15 @@ class WaitFor:
 
         while True:
             retval = self.func(*self.func_args)
-            Progress.report(f"  {self.func.__name__} returned {retval}")
+            Progress.report(f"  {self.func.__name__} returned {retval}", level=progress.DEBUG)
             if not retval == other_than_value:
                 return retval
+            deadline.check()
             if timeout_at and time.time() > timeout_at:
                 raise TimedOut(f"Function {self.func.__name__} did not return a non-{other_than_value} value " +
                                f"within {timeout_seconds} seconds")
             self._sleep_until_next_check_time()
 
     def _sleep_until_next_check_time(self):
-        time.sleep(self.backoff_seconds)
+        deadline.sleep(self.backoff_seconds)
         self.backoff_seconds = min(60.0, self.backoff_seconds * self.EXPONENTIAL_BACKOFF_FACTOR)